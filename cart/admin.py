@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Cart, CartItem, Coupon
+from .models import Cart, CartItem, Coupon, CouponRedemption
 
 
 class CartItemInline(admin.TabularInline):
@@ -29,3 +29,10 @@ class CouponAdmin(admin.ModelAdmin):
     list_filter = ['is_active', 'discount_type']
     search_fields = ['code']
     list_editable = ['is_active']
+
+
+@admin.register(CouponRedemption)
+class CouponRedemptionAdmin(admin.ModelAdmin):
+    list_display = ['coupon', 'user', 'order', 'redeemed_at']
+    list_filter = ['coupon']
+    raw_id_fields = ['user', 'order']
@@ -1,21 +1,5 @@
-from .models import Cart
+from .counts import get_cart_count
 
 
 def cart_count(request):
-    
-    count = 0
-    if request.user.is_authenticated:
-        try:
-            cart = Cart.objects.get(user=request.user)
-            count = cart.total_items
-        except Cart.DoesNotExist:
-            pass
-    else:
-        session_key = request.session.session_key
-        if session_key:
-            try:
-                cart = Cart.objects.get(session_key=session_key)
-                count = cart.total_items
-            except Cart.DoesNotExist:
-                pass
-    return {'cart_count': count}
+    return {'cart_count': get_cart_count(request)}
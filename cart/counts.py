@@ -0,0 +1,43 @@
+import time
+from django.db.models import Sum
+from .models import CartItem
+from .session import SESSION_KEY, adopt_guest_cart
+
+COUNT_SESSION_KEY = 'cart_count'
+# Each device keeps its own copy in its session, so changes made from
+# another device show up once this has passed.
+CART_COUNT_TTL = 60 * 5
+
+
+def _count_items(request):
+    items = CartItem.objects.filter(cart__user=request.user)
+    return items.aggregate(total=Sum('quantity'))['total'] or 0
+
+
+def get_cart_count(request):
+    if not request.user.is_authenticated:
+        # Guests' carts are in their session; only a session's first look
+        # checks for an old Cart row to adopt.
+        adopt_guest_cart(request.session)
+        return sum(request.session.get(SESSION_KEY, {}).values())
+    cached = request.session.get(COUNT_SESSION_KEY)
+    if cached and cached[1] > time.time():
+        return cached[0]
+    count = _count_items(request)
+    set_cart_count(request, count)
+    return count
+
+
+def set_cart_count(request, count):
+    if request.user.is_authenticated:
+        request.session[COUNT_SESSION_KEY] = [count, time.time() + CART_COUNT_TTL]
+
+
+def refresh_cart_count(request, cart):
+    count = cart.item_count()
+    set_cart_count(request, count)
+    return count
+
+
+def forget_cart_count(request):
+    request.session.pop(COUNT_SESSION_KEY, None)
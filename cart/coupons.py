@@ -0,0 +1,62 @@
+from django.contrib import messages
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from .models import Coupon, CouponRedemption
+
+SESSION_KEY = 'coupon_code'
+# Short enough that edits in the admin and exhausted coupons show up quickly;
+# redeem_coupon re-checks everything against the row itself.
+COUPON_CACHE_TIMEOUT = 60
+
+
+class CouponUnavailable(Exception):
+    pass
+
+
+def _cache_key(code):
+    return f'coupon:{code}'
+
+
+def get_coupon(code):
+    key = _cache_key(code)
+    coupon = cache.get(key)
+    if coupon is None:
+        # Unknown codes are cached as False so guessing doesn't hit the table.
+        coupon = Coupon.objects.filter(code=code).first() or False
+        cache.set(key, coupon, COUPON_CACHE_TIMEOUT)
+    return coupon or None
+
+
+def forget_coupon(code):
+    cache.delete(_cache_key(code))
+
+
+def applied_coupon(request, subtotal):
+    code = request.session.get(SESSION_KEY)
+    if not code:
+        return None, 0
+    coupon = get_coupon(code)
+    if coupon is None or not coupon.is_valid():
+        del request.session[SESSION_KEY]
+        messages.warning(request, f'Coupon "{code}" is no longer available and has been removed.')
+        return None, 0
+    return coupon, coupon.calculate_discount(subtotal)
+
+
+def redeem_coupon(coupon, user, order):
+    # The usage check lives in the UPDATE's WHERE clause, so concurrent
+    # checkouts can never push used_count past max_uses. Call this inside the
+    # order's transaction: raising rolls the whole order back.
+    now = timezone.now()
+    claimed = (
+        Coupon.objects.filter(pk=coupon.pk, is_active=True, valid_from__lte=now, valid_to__gte=now)
+        .filter(Q(max_uses=0) | Q(used_count__lt=F('max_uses')))
+        .update(used_count=F('used_count') + 1)
+    )
+    if not claimed:
+        forget_coupon(coupon.code)
+        raise CouponUnavailable(coupon.code)
+    CouponRedemption.objects.create(coupon=coupon, user=user, order=order)
+    transaction.on_commit(lambda: forget_coupon(coupon.code))
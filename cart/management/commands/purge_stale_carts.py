@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from cart.purge import DEFAULT_CHUNK_SIZE, DEFAULT_GUEST_DAYS, purge_stale_carts
+
+
+class Command(BaseCommand):
+    help = 'Delete abandoned carts and their items in small batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--guest-days', type=int, default=DEFAULT_GUEST_DAYS, help='Idle days before a guest cart is deleted')
+        parser.add_argument('--user-days', type=int, default=None, help='Also delete signed-in users\' carts idle this many days')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='Carts deleted per transaction')
+
+    def handle(self, *args, **options):
+        carts, items = purge_stale_carts(
+            guest_days=options['guest_days'], user_days=options['user_days'], chunk_size=options['chunk_size'],
+        )
+        self.stdout.write(self.style.SUCCESS(f'✅ Deleted {carts} stale carts and {items} cart items.'))
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-17 15:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cart',
+            index=models.Index(fields=['updated_at'], name='carts_updated_d6666c_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-17 16:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0003_coupon_redemption'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='couponredemption',
+            index=models.Index(fields=['coupon', 'user'], name='coupon_rede_coupon__1d3d2e_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='couponredemption',
+            unique_together=set(),
+        ),
+    ]
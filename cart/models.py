@@ -1,9 +1,31 @@
 from django.db import models
+from django.db.models import Sum
+from django.utils import timezone
+from django.utils.functional import cached_property
 from users.models import User
 from store.models import Product
 
 
-class Cart(models.Model):
+class CartTotalsMixin:
+    # Shared by database carts and guests' session carts; both provide `lines`.
+
+    def refresh_lines(self):
+        self.__dict__.pop('lines', None)
+
+    @property
+    def total_items(self):
+        return sum(item.quantity for item in self.lines)
+
+    @property
+    def subtotal(self):
+        return sum(item.line_total for item in self.lines)
+
+    @property
+    def is_empty(self):
+        return not self.lines
+
+
+class Cart(CartTotalsMixin, models.Model):
     
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='cart', null=True, blank=True)
     session_key = models.CharField(max_length=40, null=True, blank=True, unique=True)
@@ -12,21 +34,53 @@ class Cart(models.Model):
 
     class Meta:
         db_table = 'carts'
+        indexes = [models.Index(fields=['updated_at'])]
 
     def __str__(self):
         return f"Cart of {self.user.email if self.user else self.session_key}"
 
-    @property
-    def total_items(self):
-        return sum(item.quantity for item in self.items.all())
+    @cached_property
+    def lines(self):
+        # One query loads every item with its product; the totals and the
+        # templates all reuse it for the rest of the request.
+        return list(self.items.select_related('product'))
+
+    def _touch(self):
+        # Item changes bump updated_at so purge_stale_carts sees the activity.
+        Cart.objects.filter(pk=self.pk).update(updated_at=timezone.now())
+        self.refresh_lines()
+
+    def add(self, product, quantity):
+        item, created = CartItem.objects.get_or_create(
+            cart=self, product=product,
+            defaults={'quantity': quantity}
+        )
+        if not created:
+            item.quantity += quantity
+            item.save()
+        self._touch()
+        return created
+
+    def update(self, product_id, quantity):
+        item = self.items.select_related('product').filter(product_id=product_id).first()
+        if item is None:
+            return False
+        if quantity <= 0:
+            item.delete()
+        else:
+            item.quantity = quantity
+            item.save()
+        self._touch()
+        return True
 
-    @property
-    def subtotal(self):
-        return sum(item.line_total for item in self.items.all())
+    def remove(self, product_id):
+        deleted, _ = self.items.filter(product_id=product_id).delete()
+        if deleted:
+            self._touch()
+        return bool(deleted)
 
-    @property
-    def is_empty(self):
-        return not self.items.exists()
+    def item_count(self):
+        return self.items.aggregate(total=Sum('quantity'))['total'] or 0
 
 
 class CartItem(models.Model):
@@ -91,3 +145,17 @@ class Coupon(models.Model):
         if self.discount_type == 'percentage':
             return (subtotal * self.discount_value) / 100
         return min(self.discount_value, subtotal)
+
+
+class CouponRedemption(models.Model):
+    coupon = models.ForeignKey(Coupon, on_delete=models.CASCADE, related_name='redemptions')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='coupon_redemptions')
+    order = models.ForeignKey('orders.Order', on_delete=models.CASCADE, related_name='coupon_redemptions')
+    redeemed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'coupon_redemptions'
+        indexes = [models.Index(fields=['coupon', 'user'])]
+
+    def __str__(self):
+        return f"{self.coupon.code} by {self.user.email}"
@@ -0,0 +1,38 @@
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from .models import Cart
+
+# A guest cart is keyed by a session; once that session has expired nobody
+# can reach the cart again.
+DEFAULT_GUEST_DAYS = max(1, settings.SESSION_COOKIE_AGE // 86400)
+DEFAULT_CHUNK_SIZE = 500
+
+
+def _purge(carts, chunk_size):
+    # Small transactions keep row locks short; deleted rows drop out of the
+    # filter, so each chunk simply takes the next lowest ids.
+    deleted_carts = deleted_items = 0
+    while True:
+        ids = list(carts.order_by('pk').values_list('pk', flat=True)[:chunk_size])
+        if not ids:
+            return deleted_carts, deleted_items
+        with transaction.atomic():
+            _, counts = carts.filter(pk__in=ids).delete()
+        deleted_carts += counts.get('cart.Cart', 0)
+        deleted_items += counts.get('cart.CartItem', 0)
+
+
+def purge_stale_carts(guest_days=DEFAULT_GUEST_DAYS, user_days=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    now = timezone.now()
+    deleted_carts, deleted_items = _purge(
+        Cart.objects.filter(user__isnull=True, updated_at__lt=now - timedelta(days=guest_days)), chunk_size,
+    )
+    if user_days is not None:
+        carts, items = _purge(
+            Cart.objects.filter(user__isnull=False, updated_at__lt=now - timedelta(days=user_days)), chunk_size,
+        )
+        deleted_carts += carts
+        deleted_items += items
+    return deleted_carts, deleted_items
@@ -0,0 +1,99 @@
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.functional import cached_property
+from store.models import Product
+from .models import Cart, CartItem, CartTotalsMixin
+
+SESSION_KEY = 'cart'
+
+
+class SessionCart(CartTotalsMixin):
+    # A guest's cart lives in their session as {product_id: quantity}; nothing
+    # is written to the carts tables until they sign in.
+
+    def __init__(self, session):
+        self.session = session
+        adopt_guest_cart(session)
+        self.quantities = {int(pk): quantity for pk, quantity in session.get(SESSION_KEY, {}).items()}
+
+    @cached_property
+    def lines(self):
+        products = Product.objects.in_bulk(list(self.quantities))
+        return [
+            CartItem(product=products[pk], quantity=quantity)
+            for pk, quantity in self.quantities.items() if pk in products
+        ]
+
+    def _save(self):
+        self.session[SESSION_KEY] = {str(pk): quantity for pk, quantity in self.quantities.items()}
+        self.refresh_lines()
+
+    def add(self, product, quantity):
+        created = product.pk not in self.quantities
+        self.quantities[product.pk] = min(self.quantities.get(product.pk, 0) + quantity, product.stock)
+        self._save()
+        return created
+
+    def update(self, product_id, quantity):
+        if product_id not in self.quantities:
+            return False
+        stock = Product.objects.filter(pk=product_id).values_list('stock', flat=True).first()
+        if quantity <= 0 or stock is None:
+            del self.quantities[product_id]
+        else:
+            self.quantities[product_id] = min(quantity, stock)
+        self._save()
+        return True
+
+    def remove(self, product_id):
+        if self.quantities.pop(product_id, None) is None:
+            return False
+        self._save()
+        return True
+
+    def item_count(self):
+        return sum(self.quantities.values())
+
+
+def adopt_guest_cart(session):
+    # Guest carts used to be Cart rows keyed by session_key. The first time an
+    # existing session is seen, its row's lines move into the session and the
+    # row is deleted; the session key then marks it as checked.
+    if SESSION_KEY in session or not session.session_key:
+        return
+    quantities = {}
+    cart = Cart.objects.filter(session_key=session.session_key, user__isnull=True).first()
+    if cart is not None:
+        quantities = {str(pk): quantity for pk, quantity in cart.items.values_list('product_id', 'quantity')}
+        cart.delete()
+    session[SESSION_KEY] = quantities
+
+
+def persist_session_cart(request, user):
+    # Merges into new and existing carts alike: one read of the user's lines,
+    # stock taken from the products already loaded for the session lines, and
+    # one upsert for every quantity, however large the cart.
+    session_cart = SessionCart(request.session)
+    cart, _ = Cart.objects.get_or_create(user=user)
+    lines = session_cart.lines
+    if lines:
+        with transaction.atomic():
+            existing = dict(
+                CartItem.objects.select_for_update().filter(cart=cart, product_id__in=[item.product_id for item in lines])
+                .values_list('product_id', 'quantity')
+            )
+            merged = [
+                CartItem(
+                    cart=cart, product_id=item.product_id,
+                    quantity=min(existing.get(item.product_id, 0) + item.quantity, item.product.stock),
+                )
+                for item in lines
+            ]
+            options = {'update_conflicts': True, 'update_fields': ['quantity']}
+            if connection.features.supports_update_conflicts_with_target:
+                options['unique_fields'] = ['cart', 'product']
+            CartItem.objects.bulk_create(merged, **options)
+            cart.updated_at = timezone.now()
+            cart.save(update_fields=['updated_at'])
+    request.session.pop(SESSION_KEY, None)
+    return cart
@@ -0,0 +1,21 @@
+from django.contrib.auth.signals import user_logged_in
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .coupons import forget_coupon
+from .counts import forget_cart_count
+from .models import Coupon
+from .session import SESSION_KEY, persist_session_cart
+
+
+@receiver(user_logged_in)
+def merge_guest_cart(sender, request, user, **kwargs):
+    if request is None or not request.session.get(SESSION_KEY):
+        return
+    persist_session_cart(request, user)
+    forget_cart_count(request)
+
+
+@receiver(post_save, sender=Coupon)
+@receiver(post_delete, sender=Coupon)
+def invalidate_coupon(sender, instance, **kwargs):
+    forget_coupon(instance.code)
@@ -4,8 +4,11 @@ from . import views
 urlpatterns = [
     path('', views.cart_detail_view, name='cart'),
     path('add/<int:product_id>/', views.add_to_cart_view, name='add_to_cart'),
-    path('update/<int:item_id>/', views.update_cart_view, name='update_cart'),
-    path('remove/<int:item_id>/', views.remove_from_cart_view, name='remove_from_cart'),
+    path('update/<int:product_id>/', views.update_cart_view, name='update_cart'),
+    path('remove/<int:product_id>/', views.remove_from_cart_view, name='remove_from_cart'),
+    path('json/add/<int:product_id>/', views.add_to_cart_json_view, name='add_to_cart_json'),
+    path('json/update/<int:product_id>/', views.update_cart_json_view, name='update_cart_json'),
+    path('json/remove/<int:product_id>/', views.remove_from_cart_json_view, name='remove_from_cart_json'),
     path('coupon/apply/', views.apply_coupon_view, name='apply_coupon'),
     path('coupon/remove/', views.remove_coupon_view, name='remove_coupon'),
 ]
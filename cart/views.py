@@ -1,60 +1,39 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse
+from django.http import Http404, JsonResponse
 from django.views.decorators.http import require_POST
-from .models import Cart, CartItem, Coupon
+from .models import Cart
+from .coupons import SESSION_KEY as COUPON_SESSION_KEY, applied_coupon, get_coupon
+from .counts import refresh_cart_count, set_cart_count
+from .session import SessionCart
 from store.models import Product
+from store.bundles import suggestions_for_cart
 
 
 def get_or_create_cart(request):
-    
+    if not hasattr(request, '_cart'):
+        request._cart = _get_or_create_cart(request)
+    return request._cart
+
+
+def _get_or_create_cart(request):
     if request.user.is_authenticated:
-        cart, created = Cart.objects.get_or_create(user=request.user)
-
-        if created and request.session.session_key:
-            try:
-                guest_cart = Cart.objects.get(session_key=request.session.session_key)
-                for item in guest_cart.items.all():
-                    cart_item, item_created = CartItem.objects.get_or_create(
-                        cart=cart, product=item.product,
-                        defaults={'quantity': item.quantity}
-                    )
-                    if not item_created:
-                        cart_item.quantity += item.quantity
-                        cart_item.save()
-                guest_cart.delete()
-            except Cart.DoesNotExist:
-                pass
-        return cart
-    else:
-        if not request.session.session_key:
-            request.session.create()
-        cart, created = Cart.objects.get_or_create(session_key=request.session.session_key)
+        cart, _ = Cart.objects.get_or_create(user=request.user)
         return cart
+    return SessionCart(request.session)
 
 
 def cart_detail_view(request):
     cart = get_or_create_cart(request)
-    items = cart.items.select_related('product').all()
-    coupon = None
-    discount = 0
-    coupon_code = request.session.get('coupon_code')
-    if coupon_code:
-        try:
-            coupon = Coupon.objects.get(code=coupon_code)
-            if coupon.is_valid():
-                discount = coupon.calculate_discount(cart.subtotal)
-            else:
-                del request.session['coupon_code']
-                coupon = None
-        except Coupon.DoesNotExist:
-            pass
-
-    total = cart.subtotal - discount
+    items = cart.lines
+    subtotal = cart.subtotal
+    coupon, discount = applied_coupon(request, subtotal)
+    total = subtotal - discount
     context = {
         'cart': cart,
         'items': items,
+        'suggestions': suggestions_for_cart(item.product_id for item in items),
         'coupon': coupon,
         'discount': discount,
         'total': total,
@@ -72,65 +51,130 @@ def add_to_cart_view(request, product_id):
         return redirect('product_detail', slug=product.slug)
 
     cart = get_or_create_cart(request)
-    cart_item, created = CartItem.objects.get_or_create(
-        cart=cart, product=product,
-        defaults={'quantity': quantity}
-    )
-    if not created:
-        cart_item.quantity += quantity
-        cart_item.save()
+    if not cart.add(product, quantity):
         messages.success(request, f'Updated "{product.name}" quantity in cart.')
     else:
         messages.success(request, f'"{product.name}" added to cart!')
+    refresh_cart_count(request, cart)
 
     next_url = request.POST.get('next', request.META.get('HTTP_REFERER', 'cart'))
     return redirect(next_url)
 
 
 @require_POST
-def update_cart_view(request, item_id):
+def update_cart_view(request, product_id):
     cart = get_or_create_cart(request)
-    cart_item = get_object_or_404(CartItem, id=item_id, cart=cart)
     quantity = int(request.POST.get('quantity', 1))
+    if not cart.update(product_id, quantity):
+        raise Http404('No such item in the cart.')
     if quantity <= 0:
-        cart_item.delete()
         messages.info(request, 'Item removed from cart.')
     else:
-        cart_item.quantity = quantity
-        cart_item.save()
         messages.success(request, 'Cart updated.')
+    refresh_cart_count(request, cart)
     return redirect('cart')
 
 
-def remove_from_cart_view(request, item_id):
+def remove_from_cart_view(request, product_id):
     cart = get_or_create_cart(request)
-    cart_item = get_object_or_404(CartItem, id=item_id, cart=cart)
-    cart_item.delete()
+    if not cart.remove(product_id):
+        raise Http404('No such item in the cart.')
+    refresh_cart_count(request, cart)
     messages.info(request, 'Item removed from cart.')
     return redirect('cart')
 
 
+def _json_error(message, status=400):
+    return JsonResponse({'error': message}, status=status)
+
+
+def _posted_quantity(request):
+    try:
+        return int(request.POST.get('quantity', 1))
+    except ValueError:
+        return None
+
+
+def _cart_json(request, cart, product_id, message):
+    # Everything below is derived from cart.lines, the one query that reloads
+    # the items after the change.
+    subtotal = cart.subtotal
+    coupon, discount = applied_coupon(request, subtotal)
+    count = cart.total_items
+    set_cart_count(request, count)
+    line = next((item for item in cart.lines if item.product_id == product_id), None)
+    return JsonResponse({
+        'message': message,
+        'line': line and {
+            'product_id': line.product_id,
+            'quantity': line.quantity,
+            'line_total': line.line_total,
+            'stock': line.product.stock,
+        },
+        'count': count,
+        'subtotal': subtotal,
+        'coupon': coupon.code if coupon else None,
+        'discount': discount,
+        'total': subtotal - discount,
+    })
+
+
+@require_POST
+def add_to_cart_json_view(request, product_id):
+    product = Product.objects.filter(id=product_id, is_active=True).first()
+    if product is None:
+        return _json_error('Product not found.', status=404)
+    if not product.is_in_stock:
+        return _json_error(f'"{product.name}" is out of stock.', status=409)
+    quantity = _posted_quantity(request)
+    if quantity is None or quantity <= 0:
+        return _json_error('Quantity must be a positive number.')
+    cart = get_or_create_cart(request)
+    if cart.add(product, quantity):
+        message = f'"{product.name}" added to cart!'
+    else:
+        message = f'Updated "{product.name}" quantity in cart.'
+    return _cart_json(request, cart, product.id, message)
+
+
+@require_POST
+def update_cart_json_view(request, product_id):
+    quantity = _posted_quantity(request)
+    if quantity is None:
+        return _json_error('Quantity must be a number.')
+    cart = get_or_create_cart(request)
+    if not cart.update(product_id, quantity):
+        return _json_error('No such item in the cart.', status=404)
+    return _cart_json(request, cart, product_id, 'Cart updated.' if quantity > 0 else 'Item removed from cart.')
+
+
+@require_POST
+def remove_from_cart_json_view(request, product_id):
+    cart = get_or_create_cart(request)
+    if not cart.remove(product_id):
+        return _json_error('No such item in the cart.', status=404)
+    return _cart_json(request, cart, product_id, 'Item removed from cart.')
+
+
 @require_POST
 def apply_coupon_view(request):
     code = request.POST.get('coupon_code', '').strip().upper()
     cart = get_or_create_cart(request)
-    try:
-        coupon = Coupon.objects.get(code=code)
-        if coupon.is_valid():
-            if cart.subtotal >= coupon.min_order_value:
-                request.session['coupon_code'] = code
-                messages.success(request, f'Coupon "{code}" applied successfully!')
-            else:
-                messages.error(request, f'Minimum order value of ₹{coupon.min_order_value} required.')
-        else:
-            messages.error(request, 'This coupon is invalid or expired.')
-    except Coupon.DoesNotExist:
+    coupon = get_coupon(code)
+    if coupon is None:
         messages.error(request, 'Invalid coupon code.')
+    elif not coupon.is_valid():
+        messages.error(request, 'This coupon is invalid or expired.')
+    elif cart.subtotal >= coupon.min_order_value:
+        request.session[COUPON_SESSION_KEY] = code
+        messages.success(request, f'Coupon "{code}" applied successfully!')
+    else:
+        messages.error(request, f'Minimum order value of ₹{coupon.min_order_value} required.')
     return redirect('cart')
 
 
 def remove_coupon_view(request):
-    if 'coupon_code' in request.session:
-        del request.session['coupon_code']
+    if COUPON_SESSION_KEY in request.session:
+        del request.session[COUPON_SESSION_KEY]
         messages.info(request, 'Coupon removed.')
     return redirect('cart')
@@ -51,6 +51,7 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'cart.context_processors.cart_count',
+                'store.context_processors.catalog',
             ],
         },
     },
@@ -75,6 +76,17 @@ DATABASES = {
 }
 
 
+# Version counters for the catalog, facet and search caches and the cart badge
+# counts live here, so production needs a backend shared by every worker and
+# management command (memcached, redis or the database cache); see store.W001.
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'shopnow'),
+    }
+}
+
+
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
     {'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator'},
@@ -108,6 +120,8 @@ CRISPY_TEMPLATE_PACK = 'bootstrap5'
 
 
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', 'ShopNow <no-reply@shopnow.com>')
+SITE_URL = os.environ.get('SITE_URL', 'http://localhost:8000')
 
 
 
@@ -0,0 +1,41 @@
+from store.exports import iterate_in_batches, stream_csv, stream_jsonl
+from .models import Order
+
+ORDER_FIELDS = [
+    'order_number', 'created_at', 'status', 'payment_status', 'customer_email',
+    'shipping_name', 'shipping_address_line1', 'shipping_address_line2', 'shipping_city',
+    'shipping_state', 'shipping_postal_code', 'shipping_country', 'shipping_phone',
+    'subtotal', 'discount_amount', 'shipping_cost', 'total', 'coupon',
+]
+ITEM_FIELDS = ['product_sku', 'product_name', 'unit_price', 'quantity', 'line_total']
+ORDER_LINE_COLUMNS = ORDER_FIELDS + ITEM_FIELDS
+
+
+def _order_record(order):
+    record = {field: getattr(order, field) for field in ORDER_FIELDS if field not in ('customer_email', 'coupon')}
+    record['customer_email'] = order.user.email if order.user else ''
+    record['coupon'] = order.coupon.code if order.coupon else ''
+    return record
+
+
+def order_records(queryset=None, chunk_size=1000):
+    if queryset is None:
+        queryset = Order.objects.all()
+    queryset = queryset.select_related('user', 'coupon')
+    for order in iterate_in_batches(queryset, chunk_size, prefetch=('items',)):
+        record = _order_record(order)
+        record['items'] = [{field: getattr(item, field) for field in ITEM_FIELDS} for item in order.items.all()]
+        yield record
+
+
+def order_line_records(queryset=None, chunk_size=1000):
+    for record in order_records(queryset, chunk_size):
+        items = record.pop('items')
+        for item in items:
+            yield {**record, **item}
+
+
+def stream_orders(fmt, queryset=None, chunk_size=1000):
+    if fmt == 'csv':
+        return stream_csv(ORDER_LINE_COLUMNS, order_line_records(queryset, chunk_size))
+    return stream_jsonl(order_records(queryset, chunk_size))
@@ -0,0 +1,32 @@
+import sys
+from django.core.management.base import BaseCommand
+from orders.exports import stream_orders
+from orders.models import Order
+
+
+class Command(BaseCommand):
+    help = 'Stream orders and their line items as CSV (one row per line) or JSONL (one order per line)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=['csv', 'jsonl'], default='csv')
+        parser.add_argument('--output', help='File to write to (defaults to stdout)')
+        parser.add_argument('--status', help='Only export orders with this status')
+        parser.add_argument('--since', help='Only orders placed on or after this date (YYYY-MM-DD)')
+        parser.add_argument('--until', help='Only orders placed on or before this date (YYYY-MM-DD)')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        orders = Order.objects.all()
+        if options['status']:
+            orders = orders.filter(status=options['status'])
+        if options['since']:
+            orders = orders.filter(created_at__date__gte=options['since'])
+        if options['until']:
+            orders = orders.filter(created_at__date__lte=options['until'])
+        output = open(options['output'], 'w', newline='', encoding='utf-8') if options['output'] else sys.stdout
+        try:
+            for chunk in stream_orders(options['format'], orders, options['chunk_size']):
+                output.write(chunk)
+        finally:
+            if output is not sys.stdout:
+                output.close()
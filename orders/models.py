@@ -64,6 +64,7 @@ class Order(models.Model):
         indexes = [
             models.Index(fields=['order_number']),
             models.Index(fields=['user', 'status']),
+            models.Index(fields=['status']),
         ]
 
     def __str__(self):
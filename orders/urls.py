@@ -6,6 +6,7 @@ urlpatterns = [
     path('checkout/', views.checkout_view, name='checkout'),
     path('payment/', views.payment_view, name='payment'),
     path('confirmation/<str:order_number>/', views.order_confirmation_view, name='order_confirmation'),
+    path('export/orders.<str:fmt>', views.export_orders_view, name='export_orders'),
     path('<str:order_number>/', views.order_detail_view, name='order_detail'),
     path('<str:order_number>/cancel/', views.cancel_order_view, name='cancel_order'),
 ]
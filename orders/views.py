@@ -1,11 +1,16 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import Http404, StreamingHttpResponse
+from django.utils.dateparse import parse_date
 from django.contrib import messages
 from django.db import transaction
 from .models import Order, OrderItem, Payment, OrderStatusHistory
 from .forms import CheckoutForm, PaymentForm
+from .exports import stream_orders
 from cart.views import get_or_create_cart
-from cart.models import CartItem, Coupon
+from cart.counts import set_cart_count
+from cart.coupons import SESSION_KEY as COUPON_SESSION_KEY, CouponUnavailable, applied_coupon, redeem_coupon
 from users.models import Address
 
 
@@ -17,20 +22,10 @@ def checkout_view(request):
         return redirect('cart')
 
     addresses = Address.objects.filter(user=request.user)
-    coupon_code = request.session.get('coupon_code')
-    coupon = None
-    discount = 0
-
-    if coupon_code:
-        try:
-            coupon = Coupon.objects.get(code=coupon_code)
-            if coupon.is_valid():
-                discount = coupon.calculate_discount(cart.subtotal)
-        except Coupon.DoesNotExist:
-            pass
-
+    subtotal = cart.subtotal
+    coupon, discount = applied_coupon(request, subtotal)
     shipping_cost = 0
-    total = cart.subtotal - discount + shipping_cost
+    total = subtotal - discount + shipping_cost
 
     if request.method == 'POST':
         form = CheckoutForm(request.POST, user=request.user)
@@ -86,83 +81,83 @@ def payment_view(request):
     if cart.is_empty or not checkout_data:
         return redirect('checkout')
 
-    coupon_code = request.session.get('coupon_code')
-    coupon = None
-    discount = 0
-    if coupon_code:
-        try:
-            coupon = Coupon.objects.get(code=coupon_code)
-            if coupon.is_valid():
-                discount = coupon.calculate_discount(cart.subtotal)
-        except Coupon.DoesNotExist:
-            pass
-
+    subtotal = cart.subtotal
+    had_coupon = COUPON_SESSION_KEY in request.session
+    coupon, discount = applied_coupon(request, subtotal)
+    if had_coupon and coupon is None:
+        return redirect('cart')
     shipping_cost = 0
-    total = cart.subtotal - discount + shipping_cost
+    total = subtotal - discount + shipping_cost
 
     if request.method == 'POST':
         form = PaymentForm(request.POST)
         if form.is_valid():
             payment_method = form.cleaned_data['payment_method']
-            with transaction.atomic():
-
-                order = Order.objects.create(
-                    user=request.user,
-                    shipping_name=checkout_data['shipping_name'],
-                    shipping_address_line1=checkout_data['address_line1'],
-                    shipping_address_line2=checkout_data.get('address_line2', ''),
-                    shipping_city=checkout_data['city'],
-                    shipping_state=checkout_data['state'],
-                    shipping_postal_code=checkout_data['postal_code'],
-                    shipping_country=checkout_data['country'],
-                    shipping_phone=checkout_data['phone'],
-                    notes=checkout_data.get('notes', ''),
-                    subtotal=cart.subtotal,
-                    discount_amount=discount,
-                    shipping_cost=shipping_cost,
-                    total=total,
-                    coupon=coupon,
-                    status='confirmed' if payment_method == 'cod' else 'pending',
-                    payment_status='pending',
-                )
-
-
-                for item in cart.items.select_related('product').all():
-                    OrderItem.objects.create(
-                        order=order,
-                        product=item.product,
-                        product_name=item.product.name,
-                        product_sku=item.product.sku,
-                        unit_price=item.product.effective_price,
-                        quantity=item.quantity,
+            try:
+                with transaction.atomic():
+
+                    order = Order.objects.create(
+                        user=request.user,
+                        shipping_name=checkout_data['shipping_name'],
+                        shipping_address_line1=checkout_data['address_line1'],
+                        shipping_address_line2=checkout_data.get('address_line2', ''),
+                        shipping_city=checkout_data['city'],
+                        shipping_state=checkout_data['state'],
+                        shipping_postal_code=checkout_data['postal_code'],
+                        shipping_country=checkout_data['country'],
+                        shipping_phone=checkout_data['phone'],
+                        notes=checkout_data.get('notes', ''),
+                        subtotal=subtotal,
+                        discount_amount=discount,
+                        shipping_cost=shipping_cost,
+                        total=total,
+                        coupon=coupon,
+                        status='confirmed' if payment_method == 'cod' else 'pending',
+                        payment_status='pending',
                     )
 
-                    item.product.stock -= item.quantity
-                    item.product.save(update_fields=['stock'])
 
+                    for item in cart.lines:
+                        OrderItem.objects.create(
+                            order=order,
+                            product=item.product,
+                            product_name=item.product.name,
+                            product_sku=item.product.sku,
+                            unit_price=item.product.effective_price,
+                            quantity=item.quantity,
+                        )
+
+                        item.product.stock -= item.quantity
+                        item.product.save(update_fields=['stock', 'updated_at'])
 
-                Payment.objects.create(
-                    order=order,
-                    payment_method=payment_method,
-                    amount=total,
-                    status='success' if payment_method == 'cod' else 'pending',
-                )
+
+                    Payment.objects.create(
+                        order=order,
+                        payment_method=payment_method,
+                        amount=total,
+                        status='success' if payment_method == 'cod' else 'pending',
+                    )
 
 
-                OrderStatusHistory.objects.create(order=order, status=order.status, note='Order placed')
+                    OrderStatusHistory.objects.create(order=order, status=order.status, note='Order placed')
 
 
-                if coupon:
-                    coupon.used_count += 1
-                    coupon.save(update_fields=['used_count'])
-                    del request.session['coupon_code']
+                    if coupon:
+                        redeem_coupon(coupon, request.user, order)
+                        del request.session[COUPON_SESSION_KEY]
 
 
-                cart.items.all().delete()
+                    cart.items.all().delete()
+                    cart.refresh_lines()
+                    transaction.on_commit(lambda: set_cart_count(request, 0))
 
 
-                if 'checkout_data' in request.session:
-                    del request.session['checkout_data']
+                    if 'checkout_data' in request.session:
+                        del request.session['checkout_data']
+            except CouponUnavailable:
+                del request.session[COUPON_SESSION_KEY]
+                messages.error(request, 'That coupon is no longer available. Please review your order total.')
+                return redirect('cart')
 
             messages.success(request, f'Order #{order.order_number} placed successfully!')
             return redirect('order_confirmation', order_number=order.order_number)
@@ -222,8 +217,30 @@ def cancel_order_view(request, order_number):
         for item in order.items.all():
             if item.product:
                 item.product.stock += item.quantity
-                item.product.save(update_fields=['stock'])
+                item.product.save(update_fields=['stock', 'updated_at'])
         messages.success(request, f'Order #{order.order_number} has been cancelled.')
     else:
         messages.error(request, 'This order cannot be cancelled.')
     return redirect('order_detail', order_number=order_number)
+
+
+@staff_member_required
+def export_orders_view(request, fmt):
+    if fmt not in ('csv', 'jsonl'):
+        raise Http404
+    orders = Order.objects.all()
+    if request.GET.get('status'):
+        orders = orders.filter(status=request.GET['status'])
+    try:
+        since = parse_date(request.GET.get('since', ''))
+        until = parse_date(request.GET.get('until', ''))
+    except ValueError:
+        since = until = None
+    if since:
+        orders = orders.filter(created_at__date__gte=since)
+    if until:
+        orders = orders.filter(created_at__date__lte=until)
+    content_type = 'text/csv; charset=utf-8' if fmt == 'csv' else 'application/x-ndjson; charset=utf-8'
+    response = StreamingHttpResponse(stream_orders(fmt, orders), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="orders.{fmt}"'
+    return response
@@ -22,6 +22,131 @@ document.addEventListener('DOMContentLoaded', () => {
     });
   });
 
+  // Navbar search suggestions
+  const searchInput = document.querySelector('[data-autocomplete-url]');
+  const suggestionBox = document.getElementById('searchSuggestions');
+  if (searchInput && suggestionBox) {
+    let timer = null;
+    let controller = null;
+    const groups = [['products', 'Products'], ['categories', 'Categories'], ['brands', 'Brands']];
+    const hide = () => suggestionBox.classList.remove('show');
+
+    searchInput.addEventListener('input', () => {
+      clearTimeout(timer);
+      const q = searchInput.value.trim();
+      if (!q) return hide();
+      timer = setTimeout(() => {
+        if (controller) controller.abort();
+        controller = new AbortController();
+        fetch(`${searchInput.dataset.autocompleteUrl}?q=${encodeURIComponent(q)}`, { signal: controller.signal })
+          .then(res => res.json())
+          .then(data => {
+            suggestionBox.replaceChildren();
+            groups.forEach(([key, title]) => {
+              if (!data[key] || !data[key].length) return;
+              const header = document.createElement('h6');
+              header.className = 'dropdown-header';
+              header.textContent = title;
+              suggestionBox.appendChild(header);
+              data[key].forEach(item => {
+                const link = document.createElement('a');
+                link.className = 'dropdown-item';
+                link.href = item.url;
+                link.textContent = item.label;
+                suggestionBox.appendChild(link);
+              });
+            });
+            suggestionBox.classList.toggle('show', suggestionBox.children.length > 0);
+          })
+          .catch(() => {});
+      }, 150);
+    });
+    searchInput.addEventListener('blur', () => setTimeout(hide, 200));
+  }
+
+  // Cart changes without a full page reload; forms and links still work
+  // normally when JavaScript is off.
+  const money = value => `₹${value}`;
+  const setText = (selector, text) => {
+    const el = document.querySelector(selector);
+    if (el) el.textContent = text;
+  };
+  const flash = (text, level) => {
+    let box = document.getElementById('flashMessages');
+    if (!box) {
+      box = document.createElement('div');
+      box.id = 'flashMessages';
+      box.className = 'container mt-3';
+      document.querySelector('nav').after(box);
+    }
+    const alert = document.createElement('div');
+    alert.className = `alert alert-${level} alert-dismissible fade show`;
+    alert.setAttribute('role', 'alert');
+    alert.textContent = text;
+    const close = document.createElement('button');
+    close.type = 'button';
+    close.className = 'btn-close';
+    close.dataset.bsDismiss = 'alert';
+    alert.appendChild(close);
+    box.replaceChildren(alert);
+    setTimeout(() => bootstrap.Alert.getOrCreateInstance(alert).close(), 5000);
+  };
+  const applyCart = data => {
+    const badge = document.getElementById('cartCount');
+    if (badge) {
+      badge.textContent = data.count;
+      badge.classList.toggle('d-none', !data.count);
+    }
+    if (!document.getElementById('cartTotal')) return;
+    // An emptied cart or a coupon that just lapsed changes the page layout.
+    if (!data.count || Boolean(data.coupon) !== Boolean(document.getElementById('cartDiscount'))) {
+      window.location.reload();
+      return;
+    }
+    if (data.line) {
+      const row = document.querySelector(`[data-cart-line="${data.line.product_id}"]`);
+      if (!row) {
+        window.location.reload();
+        return;
+      }
+      row.querySelector('[data-cart-line-total]').textContent = money(data.line.line_total);
+      row.querySelector('input[name="quantity"]').value = data.line.quantity;
+    }
+    setText('#cartItemCount', data.count);
+    setText('#cartSubtotal', money(data.subtotal));
+    setText('#cartDiscount', `-${money(data.discount)}`);
+    setText('#cartTotal', money(data.total));
+  };
+  const postCart = (url, body, onDone) => {
+    fetch(url, { method: 'POST', body, headers: { 'X-Requested-With': 'XMLHttpRequest' } })
+      .then(res => res.json())
+      .then(data => {
+        if (data.error) return flash(data.error, 'danger');
+        applyCart(data);
+        if (onDone) onDone(data);
+        flash(data.message, 'success');
+      })
+      .catch(() => flash('Could not update your cart. Please try again.', 'danger'));
+  };
+  document.querySelectorAll('form[data-cart-json]').forEach(form => {
+    form.addEventListener('submit', event => {
+      event.preventDefault();
+      postCart(form.dataset.cartJson, new FormData(form), data => {
+        if (!data.line) form.closest('[data-cart-line]')?.remove();
+      });
+    });
+  });
+  document.querySelectorAll('a[data-cart-json]').forEach(link => {
+    link.addEventListener('click', event => {
+      const token = document.querySelector('[name=csrfmiddlewaretoken]');
+      if (!token) return;
+      event.preventDefault();
+      const body = new FormData();
+      body.append('csrfmiddlewaretoken', token.value);
+      postCart(link.dataset.cartJson, body, () => link.closest('[data-cart-line]').remove());
+    });
+  });
+
   // Highlight selected address card
   document.querySelectorAll('.address-select').forEach(card => {
     card.addEventListener('click', () => {
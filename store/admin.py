@@ -1,5 +1,7 @@
 from django.contrib import admin
 from .models import Category, Brand, Product, ProductImage, ProductSpecification, Review, Wishlist
+from .ratings import refresh_ratings
+from .cache import bump_catalog_version
 
 
 class ProductImageInline(admin.TabularInline):
@@ -30,18 +32,19 @@ class BrandAdmin(admin.ModelAdmin):
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
-    list_display = ['name', 'category', 'price', 'discount_price', 'stock', 'is_active', 'is_featured']
+    list_display = ['name', 'category', 'price', 'discount_price', 'stock', 'rating_average', 'rating_count', 'is_active', 'is_featured']
     list_filter = ['is_active', 'is_featured', 'category', 'brand']
     search_fields = ['name', 'sku', 'description']
     prepopulated_fields = {'slug': ('name',)}
     list_editable = ['price', 'stock', 'is_active', 'is_featured']
     inlines = [ProductImageInline, ProductSpecInline]
-    readonly_fields = ['created_at', 'updated_at', 'sku']
+    readonly_fields = ['created_at', 'updated_at', 'sku', 'rating_average', 'rating_count']
     fieldsets = (
         ('Basic Info', {'fields': ('name', 'slug', 'sku', 'category', 'brand', 'short_description', 'description')}),
         ('Pricing & Stock', {'fields': ('price', 'discount_price', 'stock', 'weight')}),
         ('Media', {'fields': ('image',)}),
         ('Status', {'fields': ('is_active', 'is_featured')}),
+        ('Ratings', {'fields': ('rating_average', 'rating_count')}),
         ('Timestamps', {'fields': ('created_at', 'updated_at')}),
     )
 
@@ -55,9 +58,15 @@ class ReviewAdmin(admin.ModelAdmin):
     actions = ['approve_reviews', 'disapprove_reviews']
 
     def approve_reviews(self, request, queryset):
+        product_ids = list(queryset.values_list('product_id', flat=True).distinct())
         queryset.update(is_approved=True)
+        refresh_ratings(product_ids)
+        bump_catalog_version()
     approve_reviews.short_description = "Approve selected reviews"
 
     def disapprove_reviews(self, request, queryset):
+        product_ids = list(queryset.values_list('product_id', flat=True).distinct())
         queryset.update(is_approved=False)
+        refresh_ratings(product_ids)
+        bump_catalog_version()
     disapprove_reviews.short_description = "Disapprove selected reviews"
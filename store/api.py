@@ -0,0 +1,199 @@
+from django.core.files.storage import default_storage
+from django.urls import reverse
+from .facets import get_facet_index
+from .models import Brand, Category, Product, ProductImage, ProductSpecification, Review, effective_price_expression
+
+MAX_PAGE_SIZE = 100
+MAX_BATCH_SIZE = 100
+
+
+class FieldError(ValueError):
+    pass
+
+
+def _media_url(name):
+    return default_storage.url(name) if name else None
+
+
+class ValuesSerializer:
+    # Serializes straight from .values() rows. `columns` maps public names to
+    # ORM lookups, `computed` derives a value from other columns of the same
+    # row, and `related` fills one field for a whole page of rows with a
+    # single extra query.
+
+    def __init__(self, model, columns, default, computed=None, related=None, annotations=None):
+        self.model = model
+        self.columns = columns
+        self.default = tuple(default)
+        self.computed = computed or {}
+        self.related = related or {}
+        self.annotations = annotations or {}
+
+    @property
+    def available(self):
+        return sorted({*self.columns, *self.computed, *self.related})
+
+    def parse_fields(self, value, default=None):
+        if not value:
+            return list(default or self.default)
+        names = [name.strip() for name in value.split(',') if name.strip()]
+        unknown = [name for name in names if name not in self.available]
+        if unknown:
+            raise FieldError(f'Unknown field(s): {", ".join(unknown)}.')
+        return list(dict.fromkeys(names))
+
+    def values(self, queryset, names, extra=()):
+        lookups = set(extra)
+        for name in names:
+            if name in self.columns:
+                lookups.add(self.columns[name])
+            elif name in self.computed:
+                lookups.update(self.computed[name][0])
+            elif name in self.related:
+                lookups.add('id')
+        annotations = {key: expression() for key, expression in self.annotations.items() if key in lookups}
+        if annotations:
+            queryset = queryset.annotate(**annotations)
+        return queryset.values(*lookups)
+
+    def serialize(self, rows, names):
+        related = {
+            name: self.related[name]([row['id'] for row in rows])
+            for name in names if name in self.related
+        }
+        results = []
+        for row in rows:
+            item = {}
+            for name in names:
+                if name in self.columns:
+                    item[name] = row[self.columns[name]]
+                elif name in self.computed:
+                    item[name] = self.computed[name][1](row)
+                else:
+                    item[name] = related[name].get(row['id'], [])
+            results.append(item)
+        return results
+
+
+def _specifications(product_ids):
+    specs = {}
+    rows = ProductSpecification.objects.filter(product_id__in=product_ids).values('product_id', 'name', 'value')
+    for row in rows:
+        specs.setdefault(row['product_id'], []).append({'name': row['name'], 'value': row['value']})
+    return specs
+
+
+def _images(product_ids):
+    images = {}
+    rows = ProductImage.objects.filter(product_id__in=product_ids).values(
+        'product_id', 'image', 'alt_text', 'is_primary',
+    )
+    for row in rows:
+        images.setdefault(row['product_id'], []).append({
+            'url': _media_url(row['image']), 'alt_text': row['alt_text'], 'is_primary': row['is_primary'],
+        })
+    return images
+
+
+products = ValuesSerializer(
+    Product,
+    columns={
+        'id': 'id',
+        'name': 'name',
+        'slug': 'slug',
+        'sku': 'sku',
+        'short_description': 'short_description',
+        'description': 'description',
+        'price': 'price',
+        'discount_price': 'discount_price',
+        'effective_price': 'effective_price_value',
+        'stock': 'stock',
+        'is_featured': 'is_featured',
+        'weight': 'weight',
+        'category': 'category__slug',
+        'brand': 'brand__slug',
+        'rating_average': 'rating_average',
+        'rating_count': 'rating_count',
+        'created_at': 'created_at',
+        'updated_at': 'updated_at',
+    },
+    default=[
+        'id', 'name', 'slug', 'price', 'discount_price', 'effective_price', 'stock', 'category', 'brand',
+        'rating_average', 'rating_count', 'image', 'url',
+    ],
+    computed={
+        'in_stock': (['stock'], lambda row: row['stock'] > 0),
+        'image': (['image'], lambda row: _media_url(row['image'])),
+        'url': (['slug'], lambda row: reverse('product_detail', args=[row['slug']])),
+    },
+    related={
+        'specifications': _specifications,
+        'images': _images,
+    },
+    annotations={'effective_price_value': effective_price_expression},
+)
+
+PRODUCT_DETAIL_FIELDS = [
+    *products.default, 'sku', 'short_description', 'description', 'weight', 'in_stock',
+    'specifications', 'images', 'created_at', 'updated_at',
+]
+
+categories = ValuesSerializer(
+    Category,
+    columns={
+        'id': 'id',
+        'name': 'name',
+        'slug': 'slug',
+        'description': 'description',
+        'parent': 'parent__slug',
+        'depth': 'depth',
+    },
+    default=['id', 'name', 'slug', 'parent', 'depth', 'product_count', 'url'],
+    computed={
+        'image': (['image'], lambda row: _media_url(row['image'])),
+        'url': (['slug'], lambda row: reverse('category_products', args=[row['slug']])),
+        'product_count': (['slug'], lambda row: get_facet_index().category_count(row['slug'])),
+    },
+)
+
+brands = ValuesSerializer(
+    Brand,
+    columns={
+        'id': 'id',
+        'name': 'name',
+        'slug': 'slug',
+        'description': 'description',
+    },
+    default=['id', 'name', 'slug', 'logo'],
+    computed={
+        'logo': (['logo'], lambda row: _media_url(row['logo'])),
+    },
+)
+
+reviews = ValuesSerializer(
+    Review,
+    columns={
+        'id': 'id',
+        'product': 'product__slug',
+        'rating': 'rating',
+        'title': 'title',
+        'body': 'body',
+        'is_verified_purchase': 'is_verified_purchase',
+        'helpful_count': 'helpful_count',
+        'created_at': 'created_at',
+    },
+    default=['id', 'rating', 'title', 'body', 'author', 'is_verified_purchase', 'helpful_count', 'created_at'],
+    computed={
+        'author': (['user__first_name'], lambda row: row['user__first_name'] or 'Customer'),
+    },
+)
+
+
+def parse_batch(value, cast=str):
+    items = [item.strip() for item in value.split(',') if item.strip()]
+    if len(items) > MAX_BATCH_SIZE:
+        raise FieldError(f'At most {MAX_BATCH_SIZE} items can be fetched at once.')
+    try:
+        return list(dict.fromkeys(cast(item) for item in items))
+    except ValueError:
+        raise FieldError('Ids must be integers.')
@@ -0,0 +1,90 @@
+import re
+from decimal import Decimal
+from django.db import transaction
+from django.utils.text import slugify
+from .models import Product, ProductAttribute, ProductSpecification
+
+NUMBER_RE = re.compile(r'^\s*(\d+(?:\.\d+)?)\s*([a-z"%]*)\s*$')
+# Units that share a dimension are converted to one canonical unit so that
+# "1 TB" and "512GB" land on the same numeric scale.
+UNIT_ALIASES = {
+    'kb': ('gb', Decimal(1) / 1024 / 1024),
+    'mb': ('gb', Decimal(1) / 1024),
+    'gb': ('gb', Decimal(1)),
+    'tb': ('gb', Decimal(1024)),
+    'mg': ('g', Decimal('0.001')),
+    'g': ('g', Decimal(1)),
+    'kg': ('g', Decimal(1000)),
+    'mm': ('mm', Decimal(1)),
+    'cm': ('mm', Decimal(10)),
+    'm': ('mm', Decimal(1000)),
+    'in': ('inch', Decimal(1)),
+    'inch': ('inch', Decimal(1)),
+    'inches': ('inch', Decimal(1)),
+    '"': ('inch', Decimal(1)),
+    'mhz': ('mhz', Decimal(1)),
+    'ghz': ('mhz', Decimal(1000)),
+}
+
+
+def normalize(name, value):
+    key = slugify(name)[:100]
+    value = ' '.join(str(value).split())[:255]
+    if not key or not value:
+        return None
+    attribute = {'key': key, 'name': name[:100], 'value': value, 'value_key': value.lower(), 'numeric_value': None, 'unit': ''}
+    match = NUMBER_RE.match(value.lower())
+    if match:
+        number, unit = Decimal(match.group(1)), match.group(2)
+        unit, scale = UNIT_ALIASES.get(unit, (unit[:16], Decimal(1)))
+        number = (number * scale).quantize(Decimal('0.0001'))
+        attribute['numeric_value'] = number
+        attribute['unit'] = unit
+        attribute['value_key'] = f'{number.normalize():f}{unit}'
+    return attribute
+
+
+def build_attributes(product_ids):
+    attributes = {}
+    specs = ProductSpecification.objects.filter(product_id__in=product_ids).order_by('id')
+    for product_id, name, value in specs.values_list('product_id', 'name', 'value'):
+        attribute = normalize(name, value)
+        if attribute and (product_id, attribute['key']) not in attributes:
+            attributes[product_id, attribute['key']] = ProductAttribute(product_id=product_id, **attribute)
+    return list(attributes.values())
+
+
+def index_attributes(product_ids):
+    product_ids = list(product_ids)
+    with transaction.atomic():
+        ProductAttribute.objects.filter(product_id__in=product_ids).delete()
+        ProductAttribute.objects.bulk_create(build_attributes(product_ids), batch_size=1000)
+
+
+def rebuild_attribute_index(chunk_size=500):
+    indexed = 0
+    last_pk = 0
+    while True:
+        ids = list(
+            Product.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:chunk_size]
+        )
+        if not ids:
+            return indexed
+        index_attributes(ids)
+        indexed += len(ids)
+        last_pk = ids[-1]
+
+
+def filter_by_attributes(queryset, filters):
+    # Same semantics as FacetIndex.attributes_mask, but as one subquery per
+    # attribute so a broad filter never turns into a huge IN list of ids.
+    for key, (values, min_value, max_value) in filters.items():
+        matching = ProductAttribute.objects.filter(key=key)
+        if values:
+            matching = matching.filter(value_key__in=values)
+        if min_value is not None:
+            matching = matching.filter(numeric_value__gte=min_value)
+        if max_value is not None:
+            matching = matching.filter(numeric_value__lte=max_value)
+        queryset = queryset.filter(id__in=matching.values('product_id'))
+    return queryset
@@ -0,0 +1,141 @@
+import bisect
+import heapq
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.db import close_old_connections
+from django.db.models import Count, Q, Sum
+from django.urls import reverse
+from .models import Brand, Category, Product
+from .search import search_version, tokenize
+
+SHORT_PREFIX_LENGTH = 3
+SUGGESTIONS_PER_PREFIX = 20
+MAX_SCAN = 5000
+
+logger = logging.getLogger(__name__)
+
+_index = None
+_refreshing = False
+_lock = threading.Lock()
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='autocomplete')
+
+
+class PrefixIndex:
+    # Sorted (key, entry) array searched with bisect. Short prefixes match too
+    # many keys to scan per request, so their top suggestions are precomputed.
+
+    def __init__(self, entries):
+        self.entries = entries
+        keys = []
+        for position, entry in enumerate(entries):
+            label = entry['label'].lower()
+            for key in {label, *tokenize(label)}:
+                keys.append((key, position))
+        keys.sort()
+        self.keys = [key for key, _ in keys]
+        self.positions = [position for _, position in keys]
+
+        self.top = {}
+        for key, position in keys:
+            for length in range(1, min(len(key), SHORT_PREFIX_LENGTH) + 1):
+                self.top.setdefault(key[:length], set()).add(position)
+        for prefix, positions in self.top.items():
+            self.top[prefix] = self._rank(positions, SUGGESTIONS_PER_PREFIX)
+
+    def _rank(self, positions, limit):
+        best = heapq.nlargest(limit, positions, key=lambda position: (self.entries[position]['weight'], -position))
+        return [self.entries[position] for position in best]
+
+    def lookup(self, prefix, limit):
+        prefix = prefix.lower().strip()
+        if not prefix:
+            return []
+        if len(prefix) <= SHORT_PREFIX_LENGTH:
+            return self.top.get(prefix, [])[:limit]
+        start = bisect.bisect_left(self.keys, prefix)
+        matches = set()
+        for offset in range(start, min(start + MAX_SCAN, len(self.keys))):
+            if not self.keys[offset].startswith(prefix):
+                break
+            matches.add(self.positions[offset])
+        return self._rank(matches, limit)
+
+
+class Autocompleter:
+
+    def __init__(self, version):
+        self.version = version
+        products = Product.objects.filter(is_active=True).values('name', 'slug', 'popularity')
+        self.products = PrefixIndex([
+            {
+                'label': row['name'],
+                'url': reverse('product_detail', kwargs={'slug': row['slug']}),
+                'weight': row['popularity'],
+            }
+            for row in products.iterator(chunk_size=2000)
+        ])
+        active = Q(products__is_active=True)
+        categories = Category.objects.filter(is_active=True).annotate(
+            weight=Sum('products__popularity', filter=active), size=Count('products', filter=active),
+        ).values('name', 'slug', 'weight', 'size')
+        self.categories = PrefixIndex([
+            {
+                'label': row['name'],
+                'url': reverse('category_products', kwargs={'slug': row['slug']}),
+                'weight': (row['weight'] or 0, row['size']),
+            }
+            for row in categories
+        ])
+        brands = Brand.objects.filter(is_active=True).annotate(
+            weight=Sum('products__popularity', filter=active), size=Count('products', filter=active),
+        ).values('name', 'slug', 'weight', 'size')
+        self.brands = PrefixIndex([
+            {
+                'label': row['name'],
+                'url': f"{reverse('product_list')}?brand={row['slug']}",
+                'weight': (row['weight'] or 0, row['size']),
+            }
+            for row in brands
+        ])
+
+    def suggest(self, prefix, limit=8):
+        return {
+            'products': self.products.lookup(prefix, limit),
+            'categories': self.categories.lookup(prefix, min(limit, 3)),
+            'brands': self.brands.lookup(prefix, min(limit, 3)),
+        }
+
+
+def _refresh():
+    global _index, _refreshing
+    close_old_connections()
+    try:
+        while True:
+            version = search_version()
+            if _index.version == version:
+                break
+            _index = Autocompleter(version)
+    except Exception:
+        logger.exception('Could not rebuild the autocomplete index')
+    finally:
+        with _lock:
+            _refreshing = False
+        close_old_connections()
+
+
+def get_autocompleter():
+    # Only the first build runs in the request. After a catalog change the
+    # old index keeps answering while a background thread builds the new one.
+    global _index, _refreshing
+    version = search_version()
+    index = _index
+    if index is None:
+        _index = index = Autocompleter(version)
+    elif index.version != version:
+        with _lock:
+            start = not _refreshing
+            _refreshing = True
+        if start:
+            _executor.submit(_refresh)
+    return index
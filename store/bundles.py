@@ -0,0 +1,243 @@
+from collections import Counter, defaultdict
+from itertools import combinations, groupby
+from operator import itemgetter
+from django.db import transaction
+from django.db.models import F, Q
+from .cache import bump_catalog_version
+from .models import BundleSuggestion, CoPurchase, CountedOrder, JobCheckpoint, PurchaseCount
+
+CHECKPOINT_NAME = 'co_purchases'
+EXCLUDED_STATUSES = ('cancelled', 'refunded')
+DEFAULT_CHUNK_SIZE = 5000
+# Order ids re-read behind the checkpoint on each run.
+ORDER_ID_OVERLAP = 1000
+DEFAULT_TOP_K = 8
+MIN_CO_ORDERS = 2
+# Lift at or below 1 means the pair sells together no more than chance.
+MIN_LIFT = 1.0
+# Bulk/wholesale baskets would add n² pairs without saying much about taste.
+MAX_BASKET_SIZE = 50
+LOOKUP_BATCH = 200
+WRITE_BATCH = 1000
+
+
+def _baskets(order_ids):
+    from orders.models import OrderItem
+
+    items = (
+        OrderItem.objects.filter(order_id__in=order_ids, product__isnull=False)
+        .order_by('order_id')
+        .values_list('order_id', 'product_id')
+    )
+    return [{product_id for _, product_id in rows} for _, rows in groupby(items, key=itemgetter(0))]
+
+
+def _new_orders(after_id, chunk_size):
+    # Ids are assigned at insert but rows become visible at commit, so a
+    # window behind the checkpoint is re-read for orders that committed late.
+    from orders.models import Order
+
+    return list(
+        Order.objects.filter(id__gt=after_id)
+        .exclude(status__in=EXCLUDED_STATUSES)
+        .exclude(id__in=CountedOrder.objects.filter(order_id__gt=after_id).values('order_id'))
+        .order_by('id').values_list('id', flat=True)[:chunk_size]
+    )
+
+
+def _withdrawn_orders(chunk_size):
+    from orders.models import Order
+
+    return list(
+        CountedOrder.objects.filter(
+            order_id__in=Order.objects.filter(status__in=EXCLUDED_STATUSES).values('id'),
+        ).values_list('order_id', flat=True)[:chunk_size]
+    )
+
+
+def _counts(baskets):
+    product_counts = Counter()
+    pair_counts = Counter()
+    for basket in baskets:
+        product_counts.update(basket)
+        if len(basket) <= MAX_BASKET_SIZE:
+            for first, second in combinations(sorted(basket), 2):
+                pair_counts[first, second] += 1
+                pair_counts[second, first] += 1
+    return product_counts, pair_counts
+
+
+def _increment(queryset, ids_by_delta):
+    # Grouping rows by their delta turns thousands of increments into a few
+    # UPDATE ... SET orders = orders + n statements.
+    for delta, ids in ids_by_delta.items():
+        for start in range(0, len(ids), WRITE_BATCH):
+            rows = queryset.filter(pk__in=ids[start:start + WRITE_BATCH])
+            rows.update(orders=F('orders') + delta)
+            if delta < 0:
+                rows.filter(orders=0).delete()
+
+
+def _add_product_counts(counts):
+    existing = set(PurchaseCount.objects.filter(product_id__in=list(counts)).values_list('product_id', flat=True))
+    PurchaseCount.objects.bulk_create([
+        PurchaseCount(product_id=product_id, orders=orders)
+        for product_id, orders in counts.items() if product_id not in existing and orders > 0
+    ], batch_size=WRITE_BATCH)
+    ids_by_delta = defaultdict(list)
+    for product_id in existing:
+        ids_by_delta[counts[product_id]].append(product_id)
+    _increment(PurchaseCount.objects.all(), ids_by_delta)
+
+
+def _add_pair_counts(counts):
+    others = defaultdict(list)
+    for product_id, other_id in counts:
+        others[product_id].append(other_id)
+    products = list(others)
+    existing = {}
+    for start in range(0, len(products), LOOKUP_BATCH):
+        condition = Q()
+        for product_id in products[start:start + LOOKUP_BATCH]:
+            condition |= Q(product_id=product_id, other_id__in=others[product_id])
+        for pk, product_id, other_id in CoPurchase.objects.filter(condition).values_list('id', 'product_id', 'other_id'):
+            existing[product_id, other_id] = pk
+    CoPurchase.objects.bulk_create([
+        CoPurchase(product_id=product_id, other_id=other_id, orders=orders)
+        for (product_id, other_id), orders in counts.items() if (product_id, other_id) not in existing and orders > 0
+    ], batch_size=WRITE_BATCH)
+    ids_by_delta = defaultdict(list)
+    for pair, pk in existing.items():
+        ids_by_delta[counts[pair]].append(pk)
+    _increment(CoPurchase.objects.all(), ids_by_delta)
+
+
+def _merge(checkpoint, baskets, sign):
+    product_counts, pair_counts = _counts(baskets)
+    _add_product_counts({product_id: sign * orders for product_id, orders in product_counts.items()})
+    _add_pair_counts({pair: sign * orders for pair, orders in pair_counts.items()})
+    checkpoint.processed += sign * len(baskets)
+    return product_counts
+
+
+def accumulate(chunk_size=DEFAULT_CHUNK_SIZE, overlap=ORDER_ID_OVERLAP):
+    # Each chunk of orders is merged, recorded as counted and the checkpoint
+    # advanced in one transaction, so an interrupted run resumes without
+    # double counting. Counted orders that have since been cancelled or
+    # refunded are subtracted again the same way.
+    checkpoint, _ = JobCheckpoint.objects.get_or_create(name=CHECKPOINT_NAME)
+    touched = set()
+    processed = withdrawn = 0
+    after_id = max(checkpoint.position - overlap, 0)
+    while True:
+        order_ids = _new_orders(after_id, chunk_size)
+        if not order_ids:
+            break
+        baskets = _baskets(order_ids)
+        with transaction.atomic():
+            touched.update(_merge(checkpoint, baskets, 1))
+            CountedOrder.objects.bulk_create(
+                [CountedOrder(order_id=order_id) for order_id in order_ids], batch_size=WRITE_BATCH,
+            )
+            checkpoint.position = max(checkpoint.position, order_ids[-1])
+            checkpoint.save(update_fields=['position', 'processed', 'updated_at'])
+        after_id = order_ids[-1]
+        processed += len(baskets)
+    while True:
+        order_ids = _withdrawn_orders(chunk_size)
+        if not order_ids:
+            break
+        baskets = _baskets(order_ids)
+        with transaction.atomic():
+            touched.update(_merge(checkpoint, baskets, -1))
+            CountedOrder.objects.filter(order_id__in=order_ids).delete()
+            checkpoint.save(update_fields=['processed', 'updated_at'])
+        withdrawn += len(baskets)
+    return checkpoint, touched, processed, withdrawn
+
+
+def _with_partners(product_ids, min_co_orders):
+    # A pair's lift also moves when either product's count does, so the
+    # partners of touched products need rescoring too.
+    product_ids = list(product_ids)
+    rescore = set(product_ids)
+    for start in range(0, len(product_ids), LOOKUP_BATCH):
+        rescore.update(
+            CoPurchase.objects.filter(product_id__in=product_ids[start:start + LOOKUP_BATCH], orders__gte=min_co_orders)
+            .values_list('other_id', flat=True)
+        )
+    return rescore
+
+
+def score_products(product_ids, total_orders, top_k=DEFAULT_TOP_K, min_co_orders=MIN_CO_ORDERS, min_lift=MIN_LIFT):
+    # support = P(A and B); lift = P(A and B) / (P(A) * P(B)). Growth in the
+    # order total scales a whole row of lifts by the same factor, so rankings
+    # of products left out here hold, but their stored lift and support drift
+    # and pairs near min_lift may cross it: rescore everything periodically.
+    product_ids = list(product_ids)
+    stored = 0
+    for start in range(0, len(product_ids), LOOKUP_BATCH):
+        batch = product_ids[start:start + LOOKUP_BATCH]
+        pairs = list(
+            CoPurchase.objects.filter(product_id__in=batch, orders__gte=min_co_orders)
+            .values_list('product_id', 'other_id', 'orders')
+        )
+        involved = set(batch) | {other_id for _, other_id, _ in pairs}
+        counts = dict(PurchaseCount.objects.filter(product_id__in=involved).values_list('product_id', 'orders'))
+        candidates = defaultdict(list)
+        for product_id, other_id, orders in pairs:
+            lift = orders * total_orders / (counts[product_id] * counts[other_id])
+            if lift > min_lift:
+                candidates[product_id].append((lift, orders, other_id))
+        suggestions = []
+        for product_id, scored in candidates.items():
+            scored.sort(reverse=True)
+            suggestions.extend(
+                BundleSuggestion(
+                    product_id=product_id, other_id=other_id, orders=orders,
+                    support=orders / total_orders, lift=lift, rank=rank,
+                )
+                for rank, (lift, orders, other_id) in enumerate(scored[:top_k])
+            )
+        with transaction.atomic():
+            BundleSuggestion.objects.filter(product_id__in=batch).delete()
+            BundleSuggestion.objects.bulk_create(suggestions, batch_size=WRITE_BATCH)
+        stored += len(suggestions)
+    return stored
+
+
+def update_bundles(chunk_size=DEFAULT_CHUNK_SIZE, top_k=DEFAULT_TOP_K, min_co_orders=MIN_CO_ORDERS, rescore_all=False):
+    checkpoint, touched, processed, withdrawn = accumulate(chunk_size)
+    if rescore_all:
+        touched = PurchaseCount.objects.values_list('product_id', flat=True)
+    else:
+        touched = _with_partners(touched, min_co_orders)
+    stored = score_products(touched, checkpoint.processed, top_k, min_co_orders) if checkpoint.processed else 0
+    if processed or withdrawn or rescore_all:
+        bump_catalog_version()
+    return processed, withdrawn, stored
+
+
+def bundle_for_product(product_id, limit=3):
+    suggestions = (
+        BundleSuggestion.objects.filter(product_id=product_id, other__is_active=True, other__stock__gt=0)
+        .select_related('other__category').order_by('rank')[:limit]
+    )
+    return [suggestion.other for suggestion in suggestions]
+
+
+def suggestions_for_cart(product_ids, limit=4):
+    product_ids = list(product_ids)
+    if not product_ids:
+        return []
+    suggestions = (
+        BundleSuggestion.objects.filter(product_id__in=product_ids, other__is_active=True, other__stock__gt=0)
+        .exclude(other_id__in=product_ids)
+        .select_related('other__category').order_by('-lift', 'rank')
+    )
+    products = {}
+    for suggestion in suggestions:
+        products.setdefault(suggestion.other_id, suggestion.other)
+        if len(products) == limit:
+            break
+    return list(products.values())
@@ -0,0 +1,41 @@
+import time
+from django.core.cache import cache
+
+CATALOG_VERSION_KEY = 'catalog:version'
+HOME_CACHE_TIMEOUT = 60 * 60
+
+
+def _seed():
+    # Counters that were evicted restart from the clock rather than 1, so a
+    # restarted counter can't land on a version whose entries are still cached.
+    return int(time.time() * 1000)
+
+
+def get_version(key):
+    return cache.get_or_set(key, _seed, None)
+
+
+def bump_version(key):
+    try:
+        return cache.incr(key)
+    except ValueError:
+        version = _seed()
+        cache.set(key, version, None)
+        return version
+
+
+def catalog_version():
+    return get_version(CATALOG_VERSION_KEY)
+
+
+def bump_catalog_version():
+    return bump_version(CATALOG_VERSION_KEY)
+
+
+def cached_for_catalog(name, builder, timeout=HOME_CACHE_TIMEOUT):
+    key = f'{name}:{catalog_version()}'
+    value = cache.get(key)
+    if value is None:
+        value = builder()
+        cache.set(key, value, timeout)
+    return value
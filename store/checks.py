@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    # Catalog, facet, search and cart-count invalidation all go through
+    # counters in the default cache; a per-process cache means other workers
+    # and management commands never see a bump.
+    backend = settings.CACHES['default']['BACKEND']
+    if settings.DEBUG or backend not in PROCESS_LOCAL_CACHES:
+        return []
+    return [Warning(
+        f'The default cache ({backend}) is not shared between processes.',
+        hint='Set CACHE_BACKEND/CACHE_LOCATION to memcached, redis or the database cache in production.',
+        id='store.W001',
+    )]
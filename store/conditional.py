@@ -0,0 +1,60 @@
+import hashlib
+from django.contrib.messages import get_messages
+from django.db.models import Max, Q
+from .cache import catalog_version
+from .models import Product, Wishlist
+
+
+def _personalization(request, product_id=None):
+    # Parts of the page that differ per visitor: navbar cart badge, wishlist
+    # state and the CSRF token embedded in forms.
+    if not request.user.is_authenticated and not request.COOKIES:
+        return ''
+    from cart.counts import get_cart_count
+
+    parts = [
+        str(request.user.pk or ''),
+        request.COOKIES.get('csrftoken', ''),
+        str(get_cart_count(request)),
+    ]
+    if request.user.is_authenticated and product_id:
+        parts.append(str(Wishlist.objects.filter(user=request.user, product_id=product_id).exists()))
+    return '|'.join(parts)
+
+
+def _has_pending_messages(request):
+    return len(get_messages(request)) > 0
+
+
+def _etag(*parts):
+    return hashlib.md5('|'.join(str(part) for part in parts).encode()).hexdigest()
+
+
+def product_state(request, slug):
+    if not hasattr(request, '_product_state'):
+        request._product_state = (
+            Product.objects.filter(slug=slug, is_active=True)
+            .annotate(latest_review=Max('reviews__updated_at', filter=Q(reviews__is_approved=True)))
+            .values('id', 'updated_at', 'stock', 'rating_sum', 'rating_count', 'latest_review')
+            .first()
+        )
+    return request._product_state
+
+
+def product_etag(request, slug):
+    # Stock is hashed directly because stock-only saves need not move
+    # updated_at; the catalog version covers the similar-products and
+    # bought-together sections, which depend on other products' state.
+    state = product_state(request, slug)
+    if state is None or _has_pending_messages(request):
+        return None
+    return _etag(
+        state['id'], state['updated_at'].isoformat(), state['stock'], state['latest_review'], state['rating_sum'],
+        state['rating_count'], catalog_version(), request.get_full_path(), _personalization(request, state['id']),
+    )
+
+
+def category_etag(request, slug):
+    if _has_pending_messages(request):
+        return None
+    return _etag(slug, catalog_version(), request.get_full_path(), _personalization(request))
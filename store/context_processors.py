@@ -0,0 +1,5 @@
+from .cache import catalog_version
+
+
+def catalog(request):
+    return {'catalog_version': catalog_version()}
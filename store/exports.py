@@ -0,0 +1,100 @@
+import csv
+import json
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import prefetch_related_objects
+from .models import Category, Product
+
+PRODUCT_COLUMNS = [
+    'id', 'sku', 'name', 'slug', 'category', 'brand', 'price', 'discount_price', 'stock',
+    'is_active', 'is_featured', 'weight', 'image', 'short_description', 'description',
+    'specifications', 'gallery', 'created_at', 'updated_at',
+]
+
+
+class Echo:
+    # csv.writer needs a file; this one hands each formatted line straight back.
+
+    def write(self, value):
+        return value
+
+
+def iterate_in_batches(queryset, chunk_size=2000, prefetch=()):
+    # Walk the table by primary key so every batch is an indexed range scan.
+    # QuerySet.iterator() alone still buffers the full result set on MySQL.
+    last_pk = None
+    while True:
+        batch_qs = queryset.order_by('pk')
+        if last_pk is not None:
+            batch_qs = batch_qs.filter(pk__gt=last_pk)
+        batch = list(batch_qs[:chunk_size])
+        if not batch:
+            return
+        if prefetch:
+            prefetch_related_objects(batch, *prefetch)
+        yield from batch
+        last_pk = batch[-1].pk
+
+
+def stream_csv(columns, records):
+    writer = csv.writer(Echo())
+    yield writer.writerow(columns)
+    for record in records:
+        yield writer.writerow([record.get(column, '') for column in columns])
+
+
+def stream_jsonl(records):
+    for record in records:
+        yield json.dumps(record, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+
+
+def _category_paths():
+    names = dict(Category.objects.values_list('id', 'name'))
+    paths = {}
+    for pk, path in Category.objects.values_list('id', 'path'):
+        ids = [int(part) for part in path.strip('/').split('/') if part] or [pk]
+        paths[pk] = ' > '.join(names[i] for i in ids if i in names)
+    return paths
+
+
+def product_records(queryset=None, chunk_size=2000, flat=False):
+    if queryset is None:
+        queryset = Product.objects.all()
+    queryset = queryset.select_related('brand')
+    category_paths = _category_paths()
+    products = iterate_in_batches(queryset, chunk_size, prefetch=('specifications', 'images'))
+    for product in products:
+        specifications = {spec.name: spec.value for spec in product.specifications.all()}
+        gallery = [image.image.name for image in product.images.all()]
+        record = {
+            'id': product.id,
+            'sku': product.sku,
+            'name': product.name,
+            'slug': product.slug,
+            'category': category_paths.get(product.category_id, ''),
+            'brand': product.brand.name if product.brand else '',
+            'price': product.price,
+            'discount_price': product.discount_price,
+            'stock': product.stock,
+            'is_active': product.is_active,
+            'is_featured': product.is_featured,
+            'weight': product.weight,
+            'image': product.image.name if product.image else '',
+            'short_description': product.short_description,
+            'description': product.description,
+            'specifications': specifications,
+            'gallery': gallery,
+            'created_at': product.created_at,
+            'updated_at': product.updated_at,
+        }
+        if flat:
+            record['specifications'] = '|'.join(f'{name}: {value}' for name, value in specifications.items())
+            record['gallery'] = '|'.join(gallery)
+            for key in ('discount_price', 'weight'):
+                record[key] = '' if record[key] is None else record[key]
+        yield record
+
+
+def stream_products(fmt, queryset=None, chunk_size=2000):
+    if fmt == 'csv':
+        return stream_csv(PRODUCT_COLUMNS, product_records(queryset, chunk_size, flat=True))
+    return stream_jsonl(product_records(queryset, chunk_size))
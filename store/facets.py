@@ -0,0 +1,546 @@
+import bisect
+import copy
+import logging
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from .cache import get_version, bump_version
+from .models import Category, Product, ProductAttribute
+
+logger = logging.getLogger(__name__)
+
+VERSION_CACHE_KEY = 'facets:version'
+# Bumped for changes to individual products, which are patched into the
+# live index; VERSION_CACHE_KEY forces a full rebuild.
+CHANGES_CACHE_KEY = 'facets:changes'
+# Product fields the index is built from; saves touching none of them keep it.
+INDEXED_FIELDS = {'price', 'discount_price', 'stock', 'category', 'brand', 'is_active'}
+PRICE_BUCKETS = [
+    (Decimal('0'), Decimal('500')),
+    (Decimal('500'), Decimal('1000')),
+    (Decimal('1000'), Decimal('5000')),
+    (Decimal('5000'), Decimal('20000')),
+    (Decimal('20000'), Decimal('50000')),
+    (Decimal('50000'), None),
+]
+# Smallest price difference; prices are stored with two decimal places.
+PRICE_STEP = Decimal('0.01')
+HISTOGRAM_BINS = 20
+ATTRIBUTE_FACETS = 8
+ATTRIBUTE_MAX_OPTIONS = 12
+# Changed products are re-read from this far before the last refresh, so
+# late commits and app servers with lagging clocks are still picked up.
+CHANGE_OVERLAP = timedelta(minutes=1)
+# Past these, patching costs more than rebuilding: changed products per
+# refresh, and repriced products kept outside the price-sorted bits.
+PATCH_LIMIT = 5000
+UNSORTED_LIMIT = 500
+PRODUCT_FIELDS = (
+    'id', 'price', 'discount_price', 'stock', 'category_id', 'brand__slug', 'brand__name', 'brand__is_active',
+)
+ATTRIBUTE_FIELDS = ('product_id', 'key', 'name', 'value', 'value_key', 'numeric_value', 'unit')
+
+_index = None
+_refreshing = False
+_lock = threading.Lock()
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='facets')
+
+
+def _bit_range(start, stop):
+    return ((1 << stop) - 1) ^ ((1 << start) - 1)
+
+
+def _positions_mask(positions, size):
+    bits = bytearray((size + 7) // 8)
+    for position in positions:
+        if position is not None:
+            bits[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(bits, 'little')
+
+
+def _nice_step(raw):
+    # Round a bin width up to 1, 2 or 5 times a power of ten, at least ₹1.
+    if raw <= 1:
+        return Decimal(1)
+    magnitude = Decimal(10) ** raw.adjusted()
+    for multiple in (1, 2, 5, 10):
+        if multiple * magnitude >= raw:
+            return (multiple * magnitude).quantize(Decimal(1))
+
+
+def _product_rows(products):
+    for row in products.values(*PRODUCT_FIELDS, 'is_active').iterator(chunk_size=2000):
+        row['effective_price'] = row['discount_price'] if row['discount_price'] else row['price']
+        yield row
+
+
+def _membership(row, specs):
+    # What a product's bit is set in, kept so a patch can clear it again.
+    brand = (row['brand__slug'], row['brand__name']) if row['brand__slug'] and row['brand__is_active'] else None
+    return row['category_id'], brand, row['stock'] > 0, specs
+
+
+class FacetIndex:
+    # Every active product gets one bit, positions ordered by effective price so
+    # that any price range maps to a contiguous run of bits. Products repriced
+    # or added by a patch go to fresh positions past sorted_size and are range
+    # checked one by one until the next full rebuild sorts them in.
+
+    def __init__(self, rows, categories=(), attributes=(), version=None, changes=None, built_at=None):
+        self.version = version
+        self.changes = changes
+        self.refreshed_at = built_at
+        rows = sorted(rows, key=lambda row: (row['effective_price'], row['id']))
+        self.size = self.sorted_size = len(rows)
+        self._histograms = {}
+        self.all = (1 << self.size) - 1
+        self.prices = [row['effective_price'] for row in rows]
+        self.ids = [row['id'] for row in rows]
+        self.unsorted = []
+        self.positions = {row['id']: position for position, row in enumerate(rows)}
+
+        # A category's mask covers its whole subtree: a product counts towards
+        # every active category named in its own category's materialized path.
+        by_id = {category['id']: category for category in categories}
+        self.ancestors = {
+            category['id']: tuple(
+                by_id[int(pk)]['slug'] for pk in category['path'].strip('/').split('/')
+                if pk and int(pk) in by_id and by_id[int(pk)]['is_active']
+            )
+            for category in categories
+        }
+
+        def tree_key(category):
+            return tuple(
+                by_id[int(pk)]['name'] if int(pk) in by_id else ''
+                for pk in category['path'].strip('/').split('/') if pk
+            )
+
+        self.categories = {}
+        self.category_paths = {}
+        self.category_depths = {}
+        for category in sorted(categories, key=tree_key):
+            if not category['is_active']:
+                continue
+            self.categories[category['slug']] = (category['name'], 0)
+            self.category_paths[category['slug']] = category['path']
+            self.category_depths[category['slug']] = category['depth']
+
+        # Spec attributes: one mask per (key, value) for enum filters, and the
+        # numeric values sorted with their positions for range filters. Every
+        # mask's positions are gathered first and the mask built in one go;
+        # OR-ing single bits into a growing int is quadratic in catalog size.
+        self.attributes = {}
+        specs = defaultdict(list)
+        value_positions = defaultdict(list)
+        for attribute in attributes:
+            position = self.positions.get(attribute['product_id'])
+            if position is None:
+                continue
+            self._attribute_entry(attribute)
+            spec = attribute['key'], attribute['value_key'], attribute['numeric_value']
+            value_positions[spec[:2]].append(position)
+            specs[attribute['product_id']].append(spec)
+
+        category_positions = defaultdict(list)
+        brand_positions = {}
+        stock_positions = []
+        self.memberships = {}
+        for position, row in enumerate(rows):
+            category_id, brand, in_stock, _ = self.memberships[row['id']] = _membership(row, specs.get(row['id'], ()))
+            for slug in self.ancestors.get(category_id, ()):
+                category_positions[slug].append(position)
+            if brand:
+                brand_positions.setdefault(brand[0], (brand[1], []))[1].append(position)
+            if in_stock:
+                stock_positions.append(position)
+        for slug, positions in category_positions.items():
+            if slug in self.categories:
+                self.categories[slug] = (self.categories[slug][0], self._mask_for_positions(positions))
+        self.brands = {
+            slug: (name, self._mask_for_positions(positions)) for slug, (name, positions) in brand_positions.items()
+        }
+        self.in_stock = self._mask_for_positions(stock_positions)
+        for (key, value_key), positions in value_positions.items():
+            entry = self.attributes[key]
+            mask = self._mask_for_positions(positions)
+            entry['values'][value_key] = (entry['values'][value_key][0], mask)
+            entry['mask'] |= mask
+        for key, entry in self.attributes.items():
+            # Few distinct numbers per key: order those and lay out each one's
+            # positions, instead of sorting every (number, position) pair.
+            by_number = defaultdict(list)
+            for value_key, number in entry['numeric'].items():
+                by_number[number].extend(value_positions[key, value_key])
+            entry['numbers'] = [
+                (number, position) for number in sorted(by_number) for position in sorted(by_number[number])
+            ]
+            entry['number_keys'] = [number for number, _ in entry['numbers']]
+
+    @classmethod
+    def build(cls, version=None, changes=None):
+        started = timezone.now()
+        rows = _product_rows(Product.objects.filter(is_active=True))
+        categories = list(Category.objects.values('id', 'slug', 'name', 'path', 'depth', 'is_active'))
+        attributes = ProductAttribute.objects.filter(product__is_active=True).values(*ATTRIBUTE_FIELDS)
+        return cls(
+            list(rows), categories, attributes.iterator(chunk_size=2000),
+            version=version, changes=changes, built_at=started,
+        )
+
+    def _attribute_entry(self, attribute):
+        entry = self.attributes.get(attribute['key'])
+        if entry is None:
+            entry = self.attributes[attribute['key']] = {
+                'name': attribute['name'], 'unit': attribute['unit'], 'values': {}, 'numbers': [], 'number_keys': [],
+                'mask': 0, 'numeric': {},
+            }
+        if attribute['value_key'] not in entry['values']:
+            entry['values'][attribute['value_key']] = (attribute['value'], 0)
+            if attribute['numeric_value'] is not None:
+                entry['numeric'][attribute['value_key']] = attribute['numeric_value']
+        return entry
+
+    def patched(self, rows, attributes, changes=None, refreshed_at=None):
+        # Copy on write: requests keep reading this index while the copy is
+        # patched. The masks are immutable ints, so only containers are copied.
+        index = copy.copy(self)
+        index.changes = changes
+        index.refreshed_at = refreshed_at
+        index._histograms = {}
+        index.prices = list(self.prices)
+        index.ids = list(self.ids)
+        index.unsorted = list(self.unsorted)
+        index.positions = dict(self.positions)
+        index.memberships = dict(self.memberships)
+        index.categories = dict(self.categories)
+        index.brands = dict(self.brands)
+        index.attributes = {
+            key: {
+                **entry, 'values': dict(entry['values']), 'numbers': list(entry['numbers']),
+                'number_keys': list(entry['number_keys']), 'numeric': dict(entry['numeric']),
+            }
+            for key, entry in self.attributes.items()
+        }
+        specs = defaultdict(list)
+        for attribute in attributes:
+            specs[attribute['product_id']].append(attribute)
+        for row in rows:
+            index._patch(row, specs.get(row['id'], ()))
+        return index
+
+    def _patch(self, row, attributes):
+        position = self.positions.pop(row['id'], None)
+        if position is not None:
+            self._unset(position, self.memberships.pop(row['id']))
+        if not row['is_active']:
+            return
+        if position is None or self.prices[position] != row['effective_price']:
+            # A new price would break the sorted order; the old bit stays
+            # cleared and the product takes a fresh position at the end.
+            position = self.size
+            self.size += 1
+            self.prices.append(row['effective_price'])
+            self.ids.append(row['id'])
+            self.unsorted.append(position)
+        membership = _membership(row, [
+            (attribute['key'], attribute['value_key'], attribute['numeric_value']) for attribute in attributes
+        ])
+        self.positions[row['id']] = position
+        self.memberships[row['id']] = membership
+        self._set(position, membership, attributes)
+
+    def _unset(self, position, membership):
+        clear = ~(1 << position)
+        category_id, brand, in_stock, product_specs = membership
+        self.all &= clear
+        for slug in self.ancestors.get(category_id, ()):
+            name, mask = self.categories[slug]
+            self.categories[slug] = (name, mask & clear)
+        if brand:
+            name, mask = self.brands.pop(brand[0])
+            if mask & clear:
+                self.brands[brand[0]] = (name, mask & clear)
+        if in_stock:
+            self.in_stock &= clear
+        for key, value_key, number in product_specs:
+            entry = self.attributes[key]
+            label, mask = entry['values'][value_key]
+            entry['values'][value_key] = (label, mask & clear)
+            entry['mask'] &= clear
+            if number is not None:
+                at = bisect.bisect_left(entry['numbers'], (number, position))
+                del entry['numbers'][at]
+                del entry['number_keys'][at]
+
+    def _set(self, position, membership, attributes):
+        bit = 1 << position
+        category_id, brand, in_stock, _ = membership
+        self.all |= bit
+        for slug in self.ancestors.get(category_id, ()):
+            name, mask = self.categories[slug]
+            self.categories[slug] = (name, mask | bit)
+        if brand:
+            name, mask = self.brands.get(brand[0], (brand[1], 0))
+            self.brands[brand[0]] = (name, mask | bit)
+        if in_stock:
+            self.in_stock |= bit
+        for attribute in attributes:
+            entry = self._attribute_entry(attribute)
+            label, mask = entry['values'][attribute['value_key']]
+            entry['values'][attribute['value_key']] = (label, mask | bit)
+            entry['mask'] |= bit
+            if attribute['numeric_value'] is not None:
+                at = bisect.bisect_left(entry['numbers'], (attribute['numeric_value'], position))
+                entry['numbers'].insert(at, (attribute['numeric_value'], position))
+                entry['number_keys'].insert(at, attribute['numeric_value'])
+
+    def price_mask(self, min_price=None, max_price=None, include_max=True):
+        low = None if min_price is None else Decimal(min_price)
+        high = None if max_price is None else Decimal(max_price)
+        start = 0 if low is None else bisect.bisect_left(self.prices, low, 0, self.sorted_size)
+        if high is None:
+            stop = self.sorted_size
+        elif include_max:
+            stop = bisect.bisect_right(self.prices, high, 0, self.sorted_size)
+        else:
+            stop = bisect.bisect_left(self.prices, high, 0, self.sorted_size)
+        mask = _bit_range(start, stop) if start < stop else 0
+        tail = [
+            position - self.sorted_size for position in self.unsorted
+            if (low is None or self.prices[position] >= low)
+            and (high is None or self.prices[position] < high or include_max and self.prices[position] == high)
+        ]
+        if tail:
+            mask |= _positions_mask(tail, self.size - self.sorted_size) << self.sorted_size
+        return mask
+
+    def mask_for_ids(self, ids):
+        return self._mask_for_positions(self.positions.get(product_id) for product_id in ids)
+
+    def _mask_for_positions(self, positions):
+        return _positions_mask(positions, self.size)
+
+    def _positions_for_mask(self, mask):
+        for offset, byte in enumerate(mask.to_bytes((self.size + 7) // 8, 'little')):
+            while byte:
+                low = byte & -byte
+                yield (offset << 3) + low.bit_length() - 1
+                byte ^= low
+
+    def ids_for_mask(self, mask):
+        return [self.ids[position] for position in self._positions_for_mask(mask)]
+
+    def attribute_mask(self, key, values=(), min_value=None, max_value=None):
+        # Values of one attribute are OR'd together; a range narrows the result.
+        entry = self.attributes.get(key)
+        if entry is None:
+            return 0
+        if values:
+            mask = 0
+            for value in values:
+                mask |= entry['values'].get(value, (None, 0))[1]
+        else:
+            mask = entry['mask']
+        if min_value is not None or max_value is not None:
+            start = 0 if min_value is None else bisect.bisect_left(entry['number_keys'], Decimal(min_value))
+            stop = len(entry['numbers']) if max_value is None else bisect.bisect_right(entry['number_keys'], Decimal(max_value))
+            mask &= self._mask_for_positions(position for _, position in entry['numbers'][start:stop])
+        return mask
+
+    def attributes_mask(self, filters, exclude=None):
+        mask = self.all
+        for key, (values, min_value, max_value) in filters.items():
+            if key != exclude:
+                mask &= self.attribute_mask(key, values, min_value, max_value)
+        return mask
+
+    def category_count(self, slug):
+        return self.categories.get(slug, (None, 0))[1].bit_count()
+
+    def price_histogram(self, category=None, bins=HISTOGRAM_BINS):
+        # Built from the bitmaps on first use and kept for the life of this
+        # index, so a price change only recomputes the histograms that are
+        # requested again after the facet version moves.
+        key = (category, bins)
+        if key not in self._histograms:
+            self._histograms[key] = self._price_histogram(category, bins)
+        return [dict(bucket) for bucket in self._histograms[key]]
+
+    def _price_bounds(self, mask):
+        prices = [self.prices[position] for position in self.unsorted if mask >> position & 1]
+        mask &= (1 << self.sorted_size) - 1
+        if mask:
+            prices += [self.prices[(mask & -mask).bit_length() - 1], self.prices[mask.bit_length() - 1]]
+        return min(prices), max(prices)
+
+    def _price_histogram(self, category, bins):
+        mask = self.categories.get(category, (None, 0))[1] if category else self.all
+        if not mask:
+            return []
+        low, high = self._price_bounds(mask)
+        step = _nice_step((high - low) / bins)
+        edge = low // step * step
+        histogram = []
+        while edge <= high:
+            count = (self.price_mask(edge, edge + step, include_max=False) & mask).bit_count()
+            histogram.append({'min': edge, 'max': edge + step, 'count': count})
+            edge += step
+        tallest = max(bucket['count'] for bucket in histogram)
+        for bucket in histogram:
+            bucket['height'] = round(bucket['count'] * 100 / tallest)
+        return histogram
+
+    def counts(self, category=None, brand=None, min_price=None, max_price=None, in_stock=False, candidates=None,
+               attributes=None):
+        # Each facet is counted against every active filter except its own, so
+        # shoppers see how many products they would get by switching values.
+        filters = {
+            'category': self.categories.get(category, (None, 0))[1] if category else self.all,
+            'brand': self.brands.get(brand, (None, 0))[1] if brand else self.all,
+            'price': self.price_mask(min_price, max_price),
+            'stock': self.in_stock if in_stock else self.all,
+            'candidates': self.all if candidates is None else candidates,
+            'attributes': self.attributes_mask(attributes) if attributes else self.all,
+        }
+
+        def without(name):
+            mask = self.all
+            for key, value in filters.items():
+                if key != name:
+                    mask &= value
+            return mask
+
+        base = without('category')
+        categories = [
+            {'slug': slug, 'name': name, 'depth': self.category_depths[slug], 'count': (mask & base).bit_count()}
+            for slug, (name, mask) in self.categories.items()
+        ]
+        base = without('brand')
+        brands = [
+            {'slug': slug, 'name': name, 'count': (mask & base).bit_count()}
+            for slug, (name, mask) in sorted(self.brands.items(), key=lambda item: item[1][0])
+        ]
+        base = without('price')
+        price_buckets = [
+            {'min': low, 'max': high, 'count': (self.price_mask(low, high, include_max=False) & base).bit_count()}
+            for low, high in PRICE_BUCKETS
+        ]
+        base = without('attributes')
+        facets = []
+        for key, entry in self.attributes.items():
+            # Each attribute counts against the other attributes' filters only.
+            key_base = base & self.attributes_mask(attributes, exclude=key) if attributes else base
+            coverage = (entry['mask'] & key_base).bit_count()
+            if not coverage:
+                continue
+            options = [
+                {'value': value, 'label': label, 'count': (mask & key_base).bit_count()}
+                for value, (label, mask) in entry['values'].items()
+            ]
+            options = [option for option in options if option['count']]
+            facet = {
+                'key': key, 'name': entry['name'], 'unit': entry['unit'], 'coverage': coverage,
+                'selected': bool(attributes and key in attributes),
+            }
+            numbers = {number for value, number in entry['numeric'].items() if entry['values'][value][1] & key_base}
+            if len(options) > ATTRIBUTE_MAX_OPTIONS and numbers:
+                # Too many distinct numbers to list: offer a range instead.
+                facet['range'] = {'min': min(numbers), 'max': max(numbers)}
+            else:
+                options.sort(key=lambda option: (
+                    option['value'] not in entry['numeric'], entry['numeric'].get(option['value'], 0),
+                    -option['count'], option['label'].lower(),
+                ))
+                facet['options'] = options[:ATTRIBUTE_MAX_OPTIONS]
+            facets.append(facet)
+        facets.sort(key=lambda facet: (-bool(facet['selected']), -facet['coverage'], facet['name']))
+        return {
+            'attributes': facets[:ATTRIBUTE_FACETS],
+            'categories': categories,
+            'brands': brands,
+            'price_buckets': price_buckets,
+            'in_stock': (self.in_stock & without('stock')).bit_count(),
+            'total': without(None).bit_count(),
+        }
+
+
+def affects_facets(product, update_fields):
+    if update_fields is None:
+        return True
+    fields = INDEXED_FIELDS.intersection(update_fields)
+    if fields != {'stock'}:
+        return bool(fields)
+    # Stock only feeds the in-stock bitmap, which changes when a product sells
+    # out or comes back; checkout decrements usually do neither.
+    index = _index
+    if index is None or (index.version, index.changes) != (get_version(VERSION_CACHE_KEY), get_version(CHANGES_CACHE_KEY)):
+        return True
+    position = index.positions.get(product.pk)
+    if position is None:
+        return product.is_active
+    return bool(index.in_stock >> position & 1) != (product.stock > 0)
+
+
+def bump_facet_version():
+    # Bumps wait for the commit so a refresh can't read the catalog before
+    # the change is visible and then consider itself current.
+    transaction.on_commit(lambda: bump_version(VERSION_CACHE_KEY))
+
+
+def bump_facet_changes():
+    transaction.on_commit(lambda: bump_version(CHANGES_CACHE_KEY))
+
+
+def _refreshed(index, version, changes):
+    started = timezone.now()
+    if index.version == version:
+        products = Product.objects.filter(updated_at__gte=index.refreshed_at - CHANGE_OVERLAP)
+        rows = list(_product_rows(products[:PATCH_LIMIT + 1]))
+        if len(rows) <= PATCH_LIMIT:
+            attributes = ProductAttribute.objects.filter(
+                product_id__in=[row['id'] for row in rows if row['is_active']],
+            ).values(*ATTRIBUTE_FIELDS)
+            patched = index.patched(rows, attributes, changes, started)
+            if len(patched.unsorted) <= UNSORTED_LIMIT:
+                return patched
+    return FacetIndex.build(version, changes)
+
+
+def _refresh():
+    global _index, _refreshing
+    close_old_connections()
+    try:
+        while True:
+            index = _index
+            version, changes = get_version(VERSION_CACHE_KEY), get_version(CHANGES_CACHE_KEY)
+            if (index.version, index.changes) == (version, changes):
+                break
+            _index = _refreshed(index, version, changes)
+    except Exception:
+        logger.exception('Could not refresh the facet index')
+    finally:
+        with _lock:
+            _refreshing = False
+        close_old_connections()
+
+
+def get_facet_index():
+    # Only the first build runs in the request. After that the current index
+    # keeps serving while a background thread patches or rebuilds it.
+    global _index, _refreshing
+    version, changes = get_version(VERSION_CACHE_KEY), get_version(CHANGES_CACHE_KEY)
+    index = _index
+    if index is None:
+        _index = index = FacetIndex.build(version, changes)
+    elif (index.version, index.changes) != (version, changes):
+        with _lock:
+            start = not _refreshing
+            _refreshing = True
+        if start:
+            _executor.submit(_refresh)
+    return index
@@ -0,0 +1,292 @@
+import csv
+import json
+import time
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from django.core.exceptions import ValidationError
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+from django.utils.text import slugify
+from .attributes import index_attributes
+from .cache import bump_catalog_version
+from .facets import bump_facet_version
+from .models import Brand, Category, Product, ProductImage, ProductSpecification
+from .search import bump_search_version, replace_postings
+
+PRODUCT_FIELDS = [
+    'name', 'description', 'short_description', 'price', 'discount_price', 'stock',
+    'is_active', 'is_featured', 'weight', 'image',
+]
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 't'}
+
+
+class RowError(Exception):
+    pass
+
+
+WRITE_ERRORS = (DatabaseError, RowError, ArithmeticError, ValueError)
+
+
+def read_rows(path, fmt=None):
+    fmt = fmt or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+    with open(path, newline='', encoding='utf-8') as handle:
+        if fmt == 'jsonl':
+            for line_number, line in enumerate(handle, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    yield line_number, json.loads(line)
+                except json.JSONDecodeError as exc:
+                    yield line_number, RowError(f'invalid JSON: {exc}')
+        else:
+            reader = csv.DictReader(handle)
+            for row in reader:
+                yield reader.line_num, row
+
+
+def _decimal(value, field):
+    try:
+        return Decimal(str(value).strip())
+    except InvalidOperation:
+        raise RowError(f'{field} must be a number, got {value!r}')
+
+
+def _list(value):
+    if value in (None, ''):
+        return []
+    if isinstance(value, list):
+        return value
+    return [item.strip() for item in str(value).split('|') if item.strip()]
+
+
+def _specifications(row):
+    specs = row.get('specifications')
+    if isinstance(specs, dict):
+        return [(str(name), str(value)) for name, value in specs.items()]
+    if isinstance(specs, str) and specs.strip():
+        pairs = []
+        for item in _list(specs):
+            name, sep, value = item.partition(':')
+            if not sep:
+                raise RowError(f'specification {item!r} must look like "Name: Value"')
+            pairs.append((name.strip(), value.strip()))
+        return pairs
+    pairs = [(key[5:], str(value)) for key, value in row.items() if key.startswith('spec:') and value not in (None, '')]
+    return pairs or None
+
+
+def clean_row(row):
+    if isinstance(row, RowError):
+        raise row
+    sku = str(row.get('sku') or '').strip()
+    if not sku:
+        raise RowError('sku is required')
+    cleaned = {'sku': sku[:100]}
+    for field in PRODUCT_FIELDS:
+        value = row.get(field)
+        if value is None or (value == '' and field not in ('discount_price', 'weight')):
+            continue
+        if field in ('price', 'discount_price', 'weight'):
+            value = _decimal(value, field) if value != '' else None
+        elif field in ('is_active', 'is_featured'):
+            value = value if isinstance(value, bool) else str(value).strip().lower() in TRUE_VALUES
+        elif field != 'stock':
+            value = str(value)
+        try:
+            cleaned[field] = Product._meta.get_field(field).clean(value, None)
+        except ValidationError as exc:
+            raise RowError(f"{field}: {' '.join(exc.messages)}")
+    if 'category' in row and row['category']:
+        cleaned['category'] = [part.strip() for part in str(row['category']).split('>') if part.strip()]
+    if 'brand' in row and row['brand']:
+        cleaned['brand'] = str(row['brand']).strip()
+    specs = _specifications(row)
+    if specs is not None:
+        cleaned['specifications'] = specs
+    if 'gallery' in row:
+        cleaned['gallery'] = _list(row['gallery'])
+    return cleaned
+
+
+class CatalogImporter:
+
+    def __init__(self, chunk_size=1000, stdout=None, stderr=None):
+        self.chunk_size = chunk_size
+        self.stdout = stdout
+        self.stderr = stderr
+        self.categories = {}
+        self.brands = {}
+        self.created = self.updated = self.failed = self.processed = 0
+
+    def log_error(self, line_number, message):
+        self.failed += 1
+        if self.stderr:
+            self.stderr.write(f'  line {line_number}: {message}')
+
+    def run(self, rows):
+        started = time.monotonic()
+        rows = iter(rows)
+        while True:
+            chunk = list(islice(rows, self.chunk_size))
+            if not chunk:
+                break
+            cleaned = []
+            for line_number, row in chunk:
+                try:
+                    cleaned.append((line_number, clean_row(row)))
+                except RowError as exc:
+                    self.log_error(line_number, exc)
+            self._import_chunk(self._last_per_sku(cleaned))
+            self.processed += len(chunk)
+            if self.stdout:
+                elapsed = max(time.monotonic() - started, 1e-6)
+                self.stdout.write(f'  {self.processed} rows ({self.processed / elapsed:.0f} rows/s)')
+        if self.created or self.updated:
+            bump_search_version()
+            bump_facet_version()
+            bump_catalog_version()
+        return time.monotonic() - started
+
+    def _last_per_sku(self, rows):
+        # A chunk writes one row per SKU, so earlier rows for a repeated SKU
+        # are reported rather than dropped silently; the last one wins, as it
+        # would across chunks.
+        last = {row['sku']: line_number for line_number, row in rows}
+        kept = []
+        for line_number, row in rows:
+            if last[row['sku']] == line_number:
+                kept.append((line_number, row))
+            else:
+                self.log_error(line_number, RowError(f"duplicate sku {row['sku']}, superseded by line {last[row['sku']]}"))
+        return kept
+
+    def _import_chunk(self, rows):
+        if not rows:
+            return
+        try:
+            with transaction.atomic():
+                self._write(rows)
+        except WRITE_ERRORS:
+            # Isolate the bad rows: retry one at a time so the rest still land.
+            # Categories or brands created inside the rolled-back chunk are gone too.
+            self.categories.clear()
+            self.brands.clear()
+            for line_number, row in rows:
+                try:
+                    with transaction.atomic():
+                        self._write([(line_number, row)])
+                except WRITE_ERRORS as exc:
+                    self.categories.clear()
+                    self.brands.clear()
+                    self.log_error(line_number, exc)
+
+    def _category_id(self, names):
+        key = tuple(names)
+        if key not in self.categories:
+            parent = None
+            for depth in range(1, len(names) + 1):
+                partial = tuple(names[:depth])
+                if partial not in self.categories:
+                    category = Category.objects.filter(name=names[depth - 1]).first()
+                    if category is None:
+                        category = Category(name=names[depth - 1], parent_id=parent)
+                        category.save()
+                    self.categories[partial] = category.id
+                parent = self.categories[partial]
+        return self.categories[key]
+
+    def _brand_id(self, name):
+        if name not in self.brands:
+            brand = Brand.objects.filter(name=name).first()
+            if brand is None:
+                brand = Brand.objects.create(name=name)
+            self.brands[name] = brand.id
+        return self.brands[name]
+
+    def _write(self, rows):
+        rows = dict((row['sku'], (line_number, row)) for line_number, row in rows)
+        existing = {product.sku: product for product in Product.objects.filter(sku__in=rows)}
+        now = timezone.now()
+        to_create, to_update = [], []
+        update_fields = {'updated_at'}
+
+        for sku, (line_number, row) in rows.items():
+            product = existing.get(sku)
+            if product is None:
+                if 'name' not in row or 'price' not in row:
+                    raise RowError(f'new product {sku} needs at least name and price')
+                product = Product(sku=sku, description='', created_at=now)
+                to_create.append(product)
+            changes = {field: row[field] for field in PRODUCT_FIELDS if field in row}
+            if 'category' in row:
+                changes['category_id'] = self._category_id(row['category'])
+            if 'brand' in row:
+                changes['brand_id'] = self._brand_id(row['brand'])
+            changed = [field for field, value in changes.items() if getattr(product, field) != value]
+            for field in changed:
+                setattr(product, field, changes[field])
+            if product.pk and changed:
+                # Re-imports of unchanged rows skip the (expensive) bulk UPDATE.
+                product.updated_at = now
+                to_update.append(product)
+                update_fields.update(field.removesuffix('_id') for field in changed)
+
+        if to_create:
+            wanted = {product.sku: slugify(product.name) or slugify(product.sku) for product in to_create}
+            taken = set(Product.objects.filter(slug__in=wanted.values()).values_list('slug', flat=True))
+            for product in to_create:
+                slug = wanted[product.sku]
+                if slug in taken:
+                    slug = f'{slug}-{slugify(product.sku)}'
+                taken.add(slug)
+                product.slug = slug
+            Product.objects.bulk_create(to_create)
+            if not to_create[0].pk:
+                ids = dict(Product.objects.filter(sku__in=[p.sku for p in to_create]).values_list('sku', 'id'))
+                for product in to_create:
+                    product.pk = ids[product.sku]
+        if to_update:
+            Product.objects.bulk_update(to_update, sorted(update_fields), batch_size=200)
+
+        products = {product.sku: product for product in to_create + to_update}
+        for sku, product in existing.items():
+            products.setdefault(sku, product)
+        # Rows whose only change is their specs or gallery still count as updated.
+        updated = {product.pk for product in to_update}
+        updated |= self._write_related(rows, products) - {product.pk for product in to_create}
+        self._reindex(to_create + to_update)
+        self.created += len(to_create)
+        self.updated += len(updated)
+
+    def _write_related(self, rows, products):
+        with_specs = [sku for sku, (_, row) in rows.items() if 'specifications' in row]
+        if with_specs:
+            ProductSpecification.objects.filter(product__in=[products[sku].pk for sku in with_specs]).delete()
+            ProductSpecification.objects.bulk_create([
+                ProductSpecification(product_id=products[sku].pk, name=name[:100], value=value[:255])
+                for sku in with_specs
+                for name, value in rows[sku][1]['specifications']
+            ])
+            index_attributes(products[sku].pk for sku in with_specs)
+        with_gallery = [sku for sku, (_, row) in rows.items() if 'gallery' in row]
+        touched = {products[sku].pk for sku in with_specs + with_gallery}
+        if touched:
+            Product.objects.filter(pk__in=touched).update(updated_at=timezone.now())
+        if with_gallery:
+            ProductImage.objects.filter(product__in=[products[sku].pk for sku in with_gallery]).delete()
+            ProductImage.objects.bulk_create([
+                ProductImage(product_id=products[sku].pk, image=name, order=order, is_primary=order == 0)
+                for sku in with_gallery
+                for order, name in enumerate(rows[sku][1]['gallery'])
+            ])
+        return touched
+
+    def _reindex(self, products):
+        products = list(products)
+        categories = dict(Category.objects.filter(pk__in={p.category_id for p in products}).values_list('id', 'name'))
+        brands = dict(Brand.objects.filter(pk__in={p.brand_id for p in products}).values_list('id', 'name'))
+        for product in products:
+            # Attach lightweight related objects so build_postings needs no queries.
+            product.category = Category(pk=product.category_id, name=categories[product.category_id]) if product.category_id else None
+            product.brand = Brand(pk=product.brand_id, name=brands[product.brand_id]) if product.brand_id else None
+        replace_postings(products)
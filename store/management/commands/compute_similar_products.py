@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from store.similarity import DEFAULT_BATCH_SIZE, DEFAULT_TOP_K, MIN_SCORE, compute_similar_products
+
+
+class Command(BaseCommand):
+    help = 'Precompute content-based similar products from TF-IDF cosine similarity'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=DEFAULT_TOP_K, help='Neighbours kept per product')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Rows scored per matrix product')
+        parser.add_argument('--min-score', type=float, default=MIN_SCORE, help='Lowest cosine similarity kept')
+
+    def handle(self, *args, **options):
+        products, stored = compute_similar_products(
+            top_k=options['top_k'], batch_size=options['batch_size'], min_score=options['min_score'],
+        )
+        self.stdout.write(self.style.SUCCESS(f'✅ Stored {stored} similar-product links for {products} products.'))
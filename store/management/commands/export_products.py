@@ -0,0 +1,26 @@
+import sys
+from django.core.management.base import BaseCommand
+from store.exports import stream_products
+from store.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Stream the product catalog (with specifications and images) as CSV or JSONL'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=['csv', 'jsonl'], default='csv')
+        parser.add_argument('--output', help='File to write to (defaults to stdout)')
+        parser.add_argument('--active-only', action='store_true')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        products = Product.objects.all()
+        if options['active_only']:
+            products = products.filter(is_active=True)
+        output = open(options['output'], 'w', newline='', encoding='utf-8') if options['output'] else sys.stdout
+        try:
+            for chunk in stream_products(options['format'], products, options['chunk_size']):
+                output.write(chunk)
+        finally:
+            if output is not sys.stdout:
+                output.close()
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from store.models import Brand, Category, Product, ProductImage
+from store.thumbnails import MODEL_RENDITIONS, generate
+
+
+class Command(BaseCommand):
+    help = 'Generate resized and WebP thumbnails for product, category and brand images'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Regenerate existing thumbnails')
+
+    def handle(self, *args, **options):
+        sources = [
+            (Product, 'image'),
+            (ProductImage, 'image'),
+            (Category, 'image'),
+            (Brand, 'logo'),
+        ]
+        created = failed = 0
+        for model, field in sources:
+            renditions = MODEL_RENDITIONS[model._meta.model_name]
+            names = model.objects.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True}).values_list(field, flat=True)
+            for name in names.iterator():
+                try:
+                    created += generate(name, renditions, force=options['force'])
+                except Exception as exc:
+                    failed += 1
+                    self.stderr.write(f'  {name}: {exc}')
+        self.stdout.write(self.style.SUCCESS(f'✅ Generated {created} thumbnails ({failed} images failed).'))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from store.importer import CatalogImporter, read_rows
+
+
+class Command(BaseCommand):
+    help = 'Stream products, categories, brands, specifications and images from CSV or JSONL files'
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', help='CSV or JSONL files to import')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Override format detection by file extension')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Rows written per transaction')
+
+    def handle(self, *args, **options):
+        importer = CatalogImporter(chunk_size=options['chunk_size'], stdout=self.stdout, stderr=self.stderr)
+        elapsed = 0
+        for path in options['paths']:
+            self.stdout.write(f'Importing {path}...')
+            elapsed += importer.run(read_rows(path, options['format']))
+        rate = importer.processed / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {importer.processed} rows in {elapsed:.1f}s ({rate:.0f} rows/s): '
+            f'{importer.created} created, {importer.updated} updated, {importer.failed} failed.'
+        ))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from store.attributes import rebuild_attribute_index
+from store.facets import bump_facet_version
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the typed product attribute index from specifications'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        indexed = rebuild_attribute_index(chunk_size=options['chunk_size'])
+        bump_facet_version()
+        self.stdout.write(self.style.SUCCESS(f'✅ Indexed attributes for {indexed} products.'))
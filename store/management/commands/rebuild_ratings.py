@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from store.ratings import refresh_ratings
+
+
+class Command(BaseCommand):
+    help = 'Recalculate stored rating sum, count and average for every product'
+
+    def handle(self, *args, **options):
+        updated = refresh_ratings()
+        self.stdout.write(self.style.SUCCESS(f'✅ Ratings rebuilt for {updated} products.'))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from store.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the product search inverted index'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        indexed = rebuild_index(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'✅ Indexed {indexed} products.'))
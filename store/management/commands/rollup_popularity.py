@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from store.popularity import DEFAULT_HALF_LIFE_DAYS, DEFAULT_WINDOW_DAYS, rollup_popularity
+
+
+class Command(BaseCommand):
+    help = 'Recalculate product popularity from sales, wishlist adds and page views'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=DEFAULT_WINDOW_DAYS, help='Look-back window in days')
+        parser.add_argument('--half-life', type=float, default=DEFAULT_HALF_LIFE_DAYS, help='Score half-life in days')
+
+    def handle(self, *args, **options):
+        scored = rollup_popularity(window_days=options['days'], half_life=options['half_life'])
+        self.stdout.write(self.style.SUCCESS(f'✅ Popularity updated for {scored} products.'))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from store.wishlist_alerts import EMAIL_BATCH_SIZE, send_wishlist_alerts
+
+
+class Command(BaseCommand):
+    help = 'Email users about price drops and restocks on their wishlist items'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=EMAIL_BATCH_SIZE, help='Emails per backend call')
+        parser.add_argument('--dry-run', action='store_true', help='Count the emails without sending them')
+
+    def handle(self, *args, **options):
+        sent = send_wishlist_alerts(batch_size=options['batch_size'], dry_run=options['dry_run'])
+        verb = 'Would send' if options['dry_run'] else 'Sent'
+        self.stdout.write(self.style.SUCCESS(f'✅ {verb} {sent} wishlist alert emails.'))
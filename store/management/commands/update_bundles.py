@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from store.bundles import DEFAULT_CHUNK_SIZE, DEFAULT_TOP_K, MIN_CO_ORDERS, update_bundles
+
+
+class Command(BaseCommand):
+    help = 'Fold new orders into the co-purchase matrix and refresh "frequently bought together" suggestions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='Orders merged per transaction')
+        parser.add_argument('--top-k', type=int, default=DEFAULT_TOP_K, help='Suggestions kept per product')
+        parser.add_argument('--min-orders', type=int, default=MIN_CO_ORDERS, help='Orders a pair needs to be suggested')
+        parser.add_argument('--rescore-all', action='store_true', help='Rescore every product, not just new purchases')
+
+    def handle(self, *args, **options):
+        processed, withdrawn, stored = update_bundles(
+            chunk_size=options['chunk_size'], top_k=options['top_k'],
+            min_co_orders=options['min_orders'], rescore_all=options['rescore_all'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Processed {processed} new orders, withdrew {withdrawn} cancelled or refunded; '
+            f'stored {stored} bundle suggestions.'
+        ))
@@ -0,0 +1,46 @@
+# Generated by Django 4.2.7 on 2026-10-17 14:44
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_ratings(apps, schema_editor):
+    Product = apps.get_model('store', 'Product')
+    Review = apps.get_model('store', 'Review')
+    totals = (
+        Review.objects.filter(is_approved=True)
+        .order_by().values('product_id')
+        .annotate(rating_sum=Sum('rating'), rating_count=Count('id'))
+    )
+    for row in totals.iterator():
+        Product.objects.filter(pk=row['product_id']).update(
+            rating_sum=row['rating_sum'],
+            rating_count=row['rating_count'],
+            rating_average=round(row['rating_sum'] / row['rating_count'], 1),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='rating_average',
+            field=models.DecimalField(decimal_places=1, default=0, editable=False, max_digits=2),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_ratings, migrations.RunPython.noop),
+    ]
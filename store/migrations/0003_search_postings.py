@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-17 14:45
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0002_product_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchPosting',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('term_frequency', models.FloatField()),
+                ('document_length', models.FloatField()),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_postings', to='store.product')),
+            ],
+            options={
+                'db_table': 'search_postings',
+                'unique_together': {('term', 'product')},
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-17 14:49
+
+from django.db import migrations, models
+
+
+def build_paths(apps, schema_editor):
+    Category = apps.get_model('store', 'Category')
+    children = {}
+    for pk, parent_id in Category.objects.values_list('id', 'parent_id'):
+        children.setdefault(parent_id, []).append(pk)
+    stack = [(pk, '/', 0) for pk in children.get(None, [])]
+    while stack:
+        pk, prefix, depth = stack.pop()
+        path = f'{prefix}{pk}/'
+        Category.objects.filter(pk=pk).update(path=path, depth=depth)
+        stack.extend((child, path, depth + 1) for child in children.get(pk, []))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0004_product_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='path',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=255),
+        ),
+        migrations.RunPython(build_paths, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 4.2.7 on 2026-10-17 14:50
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0005_category_materialized_path'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductViewStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('views', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'product_view_stats',
+            },
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='popularity',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['is_active', 'popularity', 'id'], name='products_is_acti_bbde9a_idx'),
+        ),
+        migrations.AddField(
+            model_name='productviewstat',
+            name='product',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='view_stats', to='store.product'),
+        ),
+        migrations.AddIndex(
+            model_name='productviewstat',
+            index=models.Index(fields=['date'], name='product_vie_date_fde46c_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='productviewstat',
+            unique_together={('product', 'date')},
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.7 on 2026-10-17 15:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0006_product_popularity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductSnapshot',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='snapshot', serialize=False, to='store.product')),
+                ('effective_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('stock', models.PositiveIntegerField()),
+                ('taken_at', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'product_snapshots',
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-17 15:03
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0008_review_sort_indexes_and_votes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductAttribute',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.SlugField(max_length=100)),
+                ('name', models.CharField(max_length=100)),
+                ('value', models.CharField(max_length=255)),
+                ('value_key', models.CharField(max_length=255)),
+                ('numeric_value', models.DecimalField(blank=True, decimal_places=4, max_digits=16, null=True)),
+                ('unit', models.CharField(blank=True, max_length=16)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attributes', to='store.product')),
+            ],
+            options={
+                'db_table': 'product_attributes',
+                'indexes': [models.Index(fields=['key', 'value_key'], name='product_att_key_52f53d_idx'), models.Index(fields=['key', 'numeric_value'], name='product_att_key_f83889_idx')],
+                'unique_together': {('product', 'key')},
+            },
+        ),
+    ]
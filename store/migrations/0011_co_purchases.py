@@ -0,0 +1,67 @@
+# Generated by Django 4.2.7 on 2026-10-17 15:07
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0010_related_products'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('position', models.BigIntegerField(default=0)),
+                ('processed', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'job_checkpoints',
+            },
+        ),
+        migrations.CreateModel(
+            name='PurchaseCount',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='purchase_count', serialize=False, to='store.product')),
+                ('orders', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'purchase_counts',
+            },
+        ),
+        migrations.CreateModel(
+            name='CoPurchase',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('orders', models.PositiveIntegerField(default=0)),
+                ('other', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='store.product')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='co_purchases', to='store.product')),
+            ],
+            options={
+                'db_table': 'co_purchases',
+                'unique_together': {('product', 'other')},
+            },
+        ),
+        migrations.CreateModel(
+            name='BundleSuggestion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('orders', models.PositiveIntegerField()),
+                ('support', models.FloatField()),
+                ('lift', models.FloatField()),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('other', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='store.product')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bundle_suggestions', to='store.product')),
+            ],
+            options={
+                'db_table': 'bundle_suggestions',
+                'indexes': [models.Index(fields=['product', 'rank'], name='bundle_sugg_product_1594bc_idx')],
+                'unique_together': {('product', 'other')},
+            },
+        ),
+    ]
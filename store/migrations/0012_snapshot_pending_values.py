@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-17 15:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0011_co_purchases'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productsnapshot',
+            name='pending_price',
+            field=models.DecimalField(decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='productsnapshot',
+            name='pending_stock',
+            field=models.PositiveIntegerField(null=True),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 4.2.7 on 2026-10-17 15:33
+
+from django.db import migrations, models
+
+
+def record_counted_orders(apps, schema_editor):
+    # Orders behind the existing checkpoint were counted if they were live.
+    JobCheckpoint = apps.get_model('store', 'JobCheckpoint')
+    CountedOrder = apps.get_model('store', 'CountedOrder')
+    Order = apps.get_model('orders', 'Order')
+    checkpoint = JobCheckpoint.objects.filter(name='co_purchases').first()
+    if checkpoint is None:
+        return
+    order_ids = (
+        Order.objects.filter(id__lte=checkpoint.position)
+        .exclude(status__in=('cancelled', 'refunded'))
+        .order_by('id').values_list('id', flat=True)
+    )
+    batch = []
+    for order_id in order_ids.iterator(chunk_size=5000):
+        batch.append(CountedOrder(order_id=order_id))
+        if len(batch) == 5000:
+            CountedOrder.objects.bulk_create(batch)
+            batch = []
+    CountedOrder.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0002_order_status_index'),
+        ('store', '0012_snapshot_pending_values'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CountedOrder',
+            fields=[
+                ('order_id', models.BigIntegerField(primary_key=True, serialize=False)),
+            ],
+            options={
+                'db_table': 'counted_orders',
+            },
+        ),
+        migrations.RunPython(record_counted_orders, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,7 @@
-from django.db import models
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Concat, Substr
 from django.utils.text import slugify
 from django.urls import reverse
 from django.core.validators import MinValueValidator, MaxValueValidator
@@ -14,6 +17,8 @@ class Category(models.Model):
         'self', on_delete=models.SET_NULL, null=True, blank=True, related_name='children'
     )
     is_active = models.BooleanField(default=True)
+    path = models.CharField(max_length=255, blank=True, editable=False, db_index=True)
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -25,14 +30,61 @@ class Category(models.Model):
     def __str__(self):
         return self.name
 
+    def clean(self):
+        if self.parent_id and self.pk and self.path and (
+            self.parent_id == self.pk or self.parent.path.startswith(self.path)
+        ):
+            raise ValidationError({'parent': 'A category cannot be placed under itself or one of its subcategories.'})
+
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.name)
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            if self.pk is None:
+                super().save(*args, **kwargs)
+                self._set_path()
+                Category.objects.filter(pk=self.pk).update(path=self.path, depth=self.depth)
+                return
+
+            self.clean()
+            old_path, old_depth = self.path, self.depth
+            self._set_path()
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'path', 'depth'}
+            super().save(*args, **kwargs)
+            if old_path and old_path != self.path:
+                # Re-parenting moves the whole subtree: rewrite every descendant's
+                # path prefix in one statement.
+                Category.objects.filter(path__startswith=old_path).exclude(pk=self.pk).update(
+                    path=Concat(Value(self.path), Substr('path', len(old_path) + 1)),
+                    depth=F('depth') + (self.depth - old_depth),
+                )
+
+    def _set_path(self):
+        parent = Category.objects.filter(pk=self.parent_id).values('path', 'depth').first() if self.parent_id else None
+        if parent:
+            self.path = f"{parent['path']}{self.pk}/"
+            self.depth = parent['depth'] + 1
+        else:
+            self.path = f"/{self.pk}/"
+            self.depth = 0
 
     def get_absolute_url(self):
         return reverse('category_products', kwargs={'slug': self.slug})
 
+    @property
+    def ancestor_ids(self):
+        return [int(pk) for pk in self.path.strip('/').split('/')[:-1] if pk]
+
+    def get_ancestors(self):
+        return Category.objects.filter(pk__in=self.ancestor_ids).order_by('depth')
+
+    def get_descendants(self, include_self=True):
+        descendants = Category.objects.filter(path__startswith=self.path)
+        if not include_self:
+            descendants = descendants.exclude(pk=self.pk)
+        return descendants
+
 
 class Brand(models.Model):
     name = models.CharField(max_length=200, unique=True)
@@ -72,6 +124,10 @@ class Product(models.Model):
     is_featured = models.BooleanField(default=False)
     sku = models.CharField(max_length=100, unique=True, blank=True)
     weight = models.DecimalField(max_digits=6, decimal_places=2, null=True, blank=True, help_text='Weight in kg')
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_average = models.DecimalField(max_digits=2, decimal_places=1, default=0, editable=False)
+    popularity = models.FloatField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -82,6 +138,12 @@ class Product(models.Model):
             models.Index(fields=['slug']),
             models.Index(fields=['is_active', 'is_featured']),
             models.Index(fields=['category']),
+            models.Index(fields=['is_active', 'created_at', 'id']),
+            models.Index(fields=['is_active', 'price', 'id']),
+            models.Index(fields=['is_active', 'name', 'id']),
+            models.Index(fields=['category', 'is_active', 'created_at', 'id']),
+            models.Index(fields=['is_active', 'popularity', 'id']),
+            models.Index(fields=['updated_at']),
         ]
 
     def __str__(self):
@@ -114,14 +176,19 @@ class Product(models.Model):
 
     @property
     def average_rating(self):
-        reviews = self.reviews.filter(is_approved=True)
-        if reviews.exists():
-            return round(sum(r.rating for r in reviews) / reviews.count(), 1)
-        return 0
+        return self.rating_average
 
     @property
     def review_count(self):
-        return self.reviews.filter(is_approved=True).count()
+        return self.rating_count
+
+
+def effective_price_expression(prefix=''):
+    return models.Case(
+        models.When(**{f'{prefix}discount_price__gt': 0}, then=models.F(f'{prefix}discount_price')),
+        default=models.F(f'{prefix}price'),
+        output_field=models.DecimalField(max_digits=10, decimal_places=2),
+    )
 
 
 class ProductImage(models.Model):
@@ -153,6 +220,28 @@ class ProductSpecification(models.Model):
         return f"{self.product.name} - {self.name}: {self.value}"
 
 
+class ProductAttribute(models.Model):
+    # Typed, normalized copy of ProductSpecification rows used for filtering.
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='attributes')
+    key = models.SlugField(max_length=100)
+    name = models.CharField(max_length=100)
+    value = models.CharField(max_length=255)
+    value_key = models.CharField(max_length=255)
+    numeric_value = models.DecimalField(max_digits=16, decimal_places=4, null=True, blank=True)
+    unit = models.CharField(max_length=16, blank=True)
+
+    class Meta:
+        db_table = 'product_attributes'
+        unique_together = ('product', 'key')
+        indexes = [
+            models.Index(fields=['key', 'value_key']),
+            models.Index(fields=['key', 'numeric_value']),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id}: {self.key} = {self.value_key}"
+
+
 class Review(models.Model):
     
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='reviews')
@@ -172,11 +261,30 @@ class Review(models.Model):
         db_table = 'reviews'
         unique_together = ('product', 'user')
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['product', 'is_approved', 'created_at', 'id']),
+            models.Index(fields=['product', 'is_approved', 'rating', 'created_at', 'id']),
+            models.Index(fields=['product', 'is_approved', 'helpful_count', 'created_at', 'id']),
+        ]
 
     def __str__(self):
         return f"{self.user.email} - {self.product.name} ({self.rating}★)"
 
 
+class ReviewVote(models.Model):
+
+    review = models.ForeignKey(Review, on_delete=models.CASCADE, related_name='votes')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='review_votes')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'review_votes'
+        unique_together = ('review', 'user')
+
+    def __str__(self):
+        return f"{self.user_id} found review {self.review_id} helpful"
+
+
 class Wishlist(models.Model):
     
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='wishlist')
@@ -189,3 +297,139 @@ class Wishlist(models.Model):
 
     def __str__(self):
         return f"{self.user.email} wishes for {self.product.name}"
+
+
+class ProductSnapshot(models.Model):
+    # Price and stock as of the last wishlist alert run; the next run diffs
+    # the live catalog against it instead of hooking Product.save().
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='snapshot')
+    effective_price = models.DecimalField(max_digits=10, decimal_places=2)
+    stock = models.PositiveIntegerField()
+    taken_at = models.DateTimeField()
+    # Live values frozen when a run starts. They become the baseline once that
+    # run's emails are out, so changes landing mid-run are reported next time.
+    pending_price = models.DecimalField(max_digits=10, decimal_places=2, null=True)
+    pending_stock = models.PositiveIntegerField(null=True)
+
+    class Meta:
+        db_table = 'product_snapshots'
+
+    def __str__(self):
+        return f"{self.product_id} at {self.taken_at}: ₹{self.effective_price}, {self.stock} in stock"
+
+
+class RelatedProduct(models.Model):
+    # Precomputed content-similarity neighbours, written by compute_similar_products.
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='similar')
+    related = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField()
+    rank = models.PositiveSmallIntegerField()
+
+    class Meta:
+        db_table = 'related_products'
+        unique_together = ('product', 'related')
+        indexes = [models.Index(fields=['product', 'rank'])]
+
+    def __str__(self):
+        return f"{self.product_id} ~ {self.related_id} ({self.score:.3f})"
+
+
+class PurchaseCount(models.Model):
+    # Number of processed orders containing the product.
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='purchase_count')
+    orders = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = 'purchase_counts'
+
+    def __str__(self):
+        return f"{self.product_id}: {self.orders} orders"
+
+
+class CoPurchase(models.Model):
+    # Sparse co-occurrence matrix: orders containing both products, stored in
+    # both directions so either side can be read by its index.
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='co_purchases')
+    other = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    orders = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = 'co_purchases'
+        unique_together = ('product', 'other')
+
+    def __str__(self):
+        return f"{self.product_id} + {self.other_id}: {self.orders} orders"
+
+
+class CountedOrder(models.Model):
+    # Orders currently folded into the co-purchase counts, so each is added
+    # once and taken back out once if it is later cancelled or refunded.
+    order_id = models.BigIntegerField(primary_key=True)
+
+    class Meta:
+        db_table = 'counted_orders'
+
+    def __str__(self):
+        return f"Order {self.order_id}"
+
+
+class BundleSuggestion(models.Model):
+    # Top co-purchase pairs per product, ranked by lift.
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='bundle_suggestions')
+    other = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    orders = models.PositiveIntegerField()
+    support = models.FloatField()
+    lift = models.FloatField()
+    rank = models.PositiveSmallIntegerField()
+
+    class Meta:
+        db_table = 'bundle_suggestions'
+        unique_together = ('product', 'other')
+        indexes = [models.Index(fields=['product', 'rank'])]
+
+    def __str__(self):
+        return f"{self.product_id} + {self.other_id} (lift {self.lift:.2f})"
+
+
+class JobCheckpoint(models.Model):
+    # Resume point for incremental batch jobs.
+    name = models.CharField(max_length=100, unique=True)
+    position = models.BigIntegerField(default=0)
+    processed = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'job_checkpoints'
+
+    def __str__(self):
+        return f"{self.name} @ {self.position}"
+
+
+class ProductViewStat(models.Model):
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='view_stats')
+    date = models.DateField()
+    views = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = 'product_view_stats'
+        unique_together = ('product', 'date')
+        indexes = [models.Index(fields=['date'])]
+
+    def __str__(self):
+        return f"{self.product_id} on {self.date}: {self.views} views"
+
+
+class SearchPosting(models.Model):
+
+    term = models.CharField(max_length=64)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='search_postings')
+    term_frequency = models.FloatField()
+    document_length = models.FloatField()
+
+    class Meta:
+        db_table = 'search_postings'
+        unique_together = ('term', 'product')
+
+    def __str__(self):
+        return f"{self.term} → {self.product_id}"
@@ -0,0 +1,115 @@
+from django.core import signing
+from django.db.models import Q
+
+CURSOR_SALT = 'store.pagination.cursor'
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+class CursorPage:
+    is_cursor = True
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None, count=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.count = count
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    # Keyset pagination: each page is fetched with a WHERE on the sort key of the
+    # last row seen, so deep pages cost the same as the first one. The primary
+    # key is appended as a tiebreaker to keep the ordering total.
+
+    def __init__(self, queryset, ordering, per_page, count=None):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.count = count
+        ordering = [ordering] if isinstance(ordering, str) else list(ordering)
+        descending = ordering[0].startswith('-')
+        if ordering[-1].lstrip('-') not in ('id', 'pk'):
+            ordering.append('-id' if descending else 'id')
+        self.ordering = ordering
+        self.fields = [(name.lstrip('-'), name.startswith('-')) for name in ordering]
+
+    def _encode(self, obj, direction):
+        if isinstance(obj, dict):
+            # .values() rows: rebuild just enough of an instance to format the key.
+            obj = self.queryset.model(**{self._field(name).attname: obj[name] for name, _ in self.fields})
+        values = [self._field(name).value_to_string(obj) if name not in ('id', 'pk') else obj.pk
+                  for name, _ in self.fields]
+        return signing.dumps({'v': values, 'd': direction}, salt=CURSOR_SALT, compress=True)
+
+    def _decode(self, cursor):
+        try:
+            data = signing.loads(cursor, salt=CURSOR_SALT)
+            values = [
+                self._field(name).to_python(value) if name not in ('id', 'pk') else int(value)
+                for (name, _), value in zip(self.fields, data['v'], strict=True)
+            ]
+        except (signing.BadSignature, KeyError, TypeError, ValueError) as exc:
+            raise InvalidCursor(str(exc))
+        return values, data['d']
+
+    def _field(self, name):
+        return self.queryset.model._meta.get_field(name)
+
+    def _after(self, values, reverse):
+        condition = Q()
+        for position, (name, descending) in enumerate(self.fields):
+            lookup = 'lt' if descending != reverse else 'gt'
+            clause = Q(**{f'{name}__{lookup}': values[position]})
+            for previous, (previous_name, _) in enumerate(self.fields[:position]):
+                clause &= Q(**{previous_name: values[previous]})
+            condition |= clause
+        return condition
+
+    def page(self, cursor=None):
+        direction = 'n'
+        queryset = self.queryset
+        if cursor:
+            values, direction = self._decode(cursor)
+            queryset = queryset.filter(self._after(values, reverse=direction == 'p'))
+
+        if direction == 'p':
+            ordering = [name[1:] if name.startswith('-') else f'-{name}' for name in self.ordering]
+        else:
+            ordering = self.ordering
+        rows = list(queryset.order_by(*ordering)[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if direction == 'p':
+            rows.reverse()
+
+        next_cursor = previous_cursor = None
+        if rows:
+            if direction == 'n':
+                next_cursor = self._encode(rows[-1], 'n') if has_more else None
+                previous_cursor = self._encode(rows[0], 'p') if cursor else None
+            else:
+                next_cursor = self._encode(rows[-1], 'n')
+                previous_cursor = self._encode(rows[0], 'p') if has_more else None
+        return CursorPage(rows, next_cursor, previous_cursor, count=self.count)
+
+    def get_page(self, cursor=None):
+        try:
+            return self.page(cursor)
+        except InvalidCursor:
+            return self.page()
@@ -0,0 +1,119 @@
+from collections import defaultdict
+from datetime import timedelta
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from .models import Product, ProductViewStat, Wishlist
+from .search import bump_search_version
+
+SALE_WEIGHT = 10.0
+WISHLIST_WEIGHT = 3.0
+VIEW_WEIGHT = 0.1
+DEFAULT_WINDOW_DAYS = 90
+DEFAULT_HALF_LIFE_DAYS = 14
+# Buffered view counts outlive a missed rollup by this many days.
+VIEW_BUFFER_DAYS = 3
+
+
+def _view_key(product_id, day):
+    return f'views:{day.isoformat()}:{product_id}'
+
+
+def record_view(product_id):
+    # Counted in the shared cache and written out by flush_views, so a page
+    # view never waits on the product's stats row lock.
+    key = _view_key(product_id, timezone.localdate())
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, VIEW_BUFFER_DAYS * 24 * 60 * 60):
+            cache.incr(key)
+
+
+def _add_views(day, counts):
+    existing = set(
+        ProductViewStat.objects.filter(date=day, product_id__in=list(counts)).values_list('product_id', flat=True)
+    )
+    ProductViewStat.objects.bulk_create([
+        ProductViewStat(product_id=product_id, date=day, views=views)
+        for product_id, views in counts.items() if product_id not in existing
+    ])
+    ids_by_delta = defaultdict(list)
+    for product_id in existing:
+        ids_by_delta[counts[product_id]].append(product_id)
+    for delta, ids in ids_by_delta.items():
+        ProductViewStat.objects.filter(date=day, product_id__in=ids).update(views=F('views') + delta)
+
+
+def flush_views(days=VIEW_BUFFER_DAYS, batch_size=1000):
+    today = timezone.localdate()
+    product_ids = list(Product.objects.values_list('id', flat=True))
+    flushed = 0
+    for offset in range(days):
+        day = today - timedelta(days=offset)
+        for start in range(0, len(product_ids), batch_size):
+            keys = {_view_key(product_id, day): product_id for product_id in product_ids[start:start + batch_size]}
+            counts = {}
+            for key, views in cache.get_many(keys).items():
+                if views:
+                    # decr rather than delete keeps views recorded meanwhile.
+                    cache.decr(key, views)
+                    counts[keys[key]] = views
+            if counts:
+                _add_views(day, counts)
+                flushed += sum(counts.values())
+    return flushed
+
+
+def _decay(day, today, half_life):
+    return 0.5 ** (max((today - day).days, 0) / half_life)
+
+
+def compute_scores(window_days=DEFAULT_WINDOW_DAYS, half_life=DEFAULT_HALF_LIFE_DAYS):
+    from orders.models import OrderItem
+
+    today = timezone.localdate()
+    since = timezone.now() - timedelta(days=window_days)
+    scores = defaultdict(float)
+
+    sales = (
+        OrderItem.objects.filter(order__created_at__gte=since, product__isnull=False)
+        .exclude(order__status__in=['cancelled', 'refunded'])
+        .annotate(day=TruncDate('order__created_at'))
+        .values('product_id', 'day').annotate(units=Sum('quantity')).order_by()
+    )
+    for row in sales.iterator():
+        scores[row['product_id']] += SALE_WEIGHT * row['units'] * _decay(row['day'], today, half_life)
+
+    wishlists = (
+        Wishlist.objects.filter(added_at__gte=since)
+        .annotate(day=TruncDate('added_at'))
+        .values('product_id', 'day').annotate(adds=Count('id')).order_by()
+    )
+    for row in wishlists.iterator():
+        scores[row['product_id']] += WISHLIST_WEIGHT * row['adds'] * _decay(row['day'], today, half_life)
+
+    views = ProductViewStat.objects.filter(date__gte=since.date()).values_list('product_id', 'date', 'views')
+    for product_id, day, count in views.iterator():
+        scores[product_id] += VIEW_WEIGHT * count * _decay(day, today, half_life)
+
+    return scores
+
+
+def rollup_popularity(window_days=DEFAULT_WINDOW_DAYS, half_life=DEFAULT_HALF_LIFE_DAYS, batch_size=1000):
+    flush_views(batch_size=batch_size)
+    scores = compute_scores(window_days, half_life)
+    with transaction.atomic():
+        Product.objects.filter(popularity__gt=0).update(popularity=0)
+        product_ids = list(scores)
+        for start in range(0, len(product_ids), batch_size):
+            batch = [
+                Product(pk=pk, popularity=round(scores[pk], 4))
+                for pk in product_ids[start:start + batch_size]
+            ]
+            Product.objects.bulk_update(batch, ['popularity'])
+    ProductViewStat.objects.filter(date__lt=timezone.localdate() - timedelta(days=window_days)).delete()
+    bump_search_version()
+    return len(scores)
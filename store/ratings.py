@@ -0,0 +1,36 @@
+from django.db import models, transaction
+from django.db.models import Case, Count, F, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, Round
+from .models import Product, Review
+
+
+def _approved_aggregate(expression):
+    approved = Review.objects.filter(product=OuterRef('pk'), is_approved=True).order_by().values('product')
+    return Coalesce(
+        Subquery(approved.annotate(value=expression).values('value')[:1]),
+        Value(0),
+        output_field=models.IntegerField(),
+    )
+
+
+def refresh_ratings(product_ids=None):
+    products = Product.objects.all()
+    if product_ids is not None:
+        product_ids = set(product_ids)
+        if not product_ids:
+            return 0
+        products = products.filter(pk__in=product_ids)
+
+    with transaction.atomic():
+        updated = products.update(
+            rating_sum=_approved_aggregate(Sum('rating')),
+            rating_count=_approved_aggregate(Count('id')),
+        )
+        products.update(
+            rating_average=Case(
+                When(rating_count=0, then=Value(0)),
+                default=Round(F('rating_sum') * 1.0 / F('rating_count'), precision=1),
+                output_field=models.DecimalField(max_digits=2, decimal_places=1),
+            )
+        )
+    return updated
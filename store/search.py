@@ -0,0 +1,166 @@
+import math
+import re
+from collections import Counter
+from django.core.cache import cache
+from django.db import models, transaction
+from django.db.models import Case, Count, F, Sum, Value, When
+from .cache import bump_version, get_version
+from .models import Product, SearchPosting
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+STOP_WORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'in', 'is',
+    'it', 'of', 'on', 'or', 'the', 'to', 'with',
+}
+FIELD_WEIGHTS = {
+    'name': 3.0,
+    'brand': 2.0,
+    'category': 2.0,
+    'short_description': 1.5,
+    'description': 1.0,
+}
+# Fields behind the postings, plus the slug the autocompleter links to.
+INDEXED_FIELDS = {'name', 'slug', 'short_description', 'description', 'category', 'brand', 'is_active'}
+BM25_K1 = 1.2
+BM25_B = 0.75
+STATS_CACHE_KEY = 'search:stats'
+VERSION_CACHE_KEY = 'search:version'
+STATS_CACHE_TIMEOUT = 60 * 10
+
+
+def tokenize(text):
+    return [
+        token for token in TOKEN_RE.findall((text or '').lower())
+        if token not in STOP_WORDS and len(token) <= 64
+    ]
+
+
+def _product_fields(product):
+    return {
+        'name': product.name,
+        'brand': product.brand.name if product.brand_id else '',
+        'category': product.category.name if product.category_id else '',
+        'short_description': product.short_description,
+        'description': product.description,
+    }
+
+
+def build_postings(product):
+    frequencies = Counter()
+    for field, text in _product_fields(product).items():
+        for token in tokenize(text):
+            frequencies[token] += FIELD_WEIGHTS[field]
+    length = sum(frequencies.values())
+    return [
+        SearchPosting(product=product, term=term, term_frequency=tf, document_length=length)
+        for term, tf in frequencies.items()
+    ]
+
+
+def index_product(product, force=False):
+    # Unchanged postings leave the search version alone, so saves that only
+    # touch unindexed fields don't make every worker rebuild autocomplete.
+    postings = build_postings(product) if product.is_active else []
+    current = set(SearchPosting.objects.filter(product=product).values_list('term', 'term_frequency', 'document_length'))
+    if not force and current == {(p.term, p.term_frequency, p.document_length) for p in postings}:
+        return False
+    with transaction.atomic():
+        SearchPosting.objects.filter(product=product).delete()
+        SearchPosting.objects.bulk_create(postings)
+    bump_search_version()
+    return True
+
+
+def replace_postings(products):
+    # Bulk form of index_product: one delete and one batched insert for the
+    # group. Category and brand must already be loaded on each product.
+    postings = [posting for product in products if product.is_active for posting in build_postings(product)]
+    with transaction.atomic():
+        SearchPosting.objects.filter(product__in=[product.pk for product in products]).delete()
+        SearchPosting.objects.bulk_create(postings, batch_size=1000)
+
+
+def reindex_products(products, chunk_size=500):
+    batch = []
+    for product in products.select_related('category', 'brand').iterator(chunk_size=chunk_size):
+        batch.append(product)
+        if len(batch) == chunk_size:
+            replace_postings(batch)
+            batch = []
+    if batch:
+        replace_postings(batch)
+
+
+def rebuild_index(chunk_size=500):
+    SearchPosting.objects.all().delete()
+    indexed = 0
+    products = Product.objects.filter(is_active=True).select_related('category', 'brand')
+    batch = []
+    for product in products.iterator(chunk_size=chunk_size):
+        batch.extend(build_postings(product))
+        indexed += 1
+        if len(batch) >= chunk_size * 20:
+            SearchPosting.objects.bulk_create(batch, batch_size=1000)
+            batch = []
+    SearchPosting.objects.bulk_create(batch, batch_size=1000)
+    cache.delete(STATS_CACHE_KEY)
+    bump_search_version()
+    return indexed
+
+
+def search_version():
+    return get_version(VERSION_CACHE_KEY)
+
+
+def bump_search_version():
+    # Deferred to commit so a background rebuild can't read the old rows and
+    # then consider itself current.
+    transaction.on_commit(lambda: bump_version(VERSION_CACHE_KEY))
+
+
+def index_stats():
+    stats = cache.get(STATS_CACHE_KEY)
+    if stats is None:
+        totals = SearchPosting.objects.values('product').annotate(length=models.Max('document_length'))
+        aggregate = totals.aggregate(documents=Count('product'), average_length=models.Avg('length'))
+        stats = (aggregate['documents'] or 0, aggregate['average_length'] or 1.0)
+        cache.set(STATS_CACHE_KEY, stats, STATS_CACHE_TIMEOUT)
+    return stats
+
+
+def term_frequencies(query):
+    # Document frequency of each query term that occurs in the index.
+    terms = list(dict.fromkeys(tokenize(query)))
+    if not terms:
+        return {}
+    return dict(
+        SearchPosting.objects.filter(term__in=terms)
+        .values('term').annotate(df=Count('id')).values_list('term', 'df')
+    )
+
+
+def matching_ids(frequencies):
+    return SearchPosting.objects.filter(term__in=list(frequencies)).values_list('product_id', flat=True).distinct()
+
+
+def search_products(query, queryset=None, frequencies=None):
+    if queryset is None:
+        queryset = Product.objects.filter(is_active=True)
+    if frequencies is None:
+        frequencies = term_frequencies(query)
+    if not frequencies:
+        return queryset.none()
+
+    document_count, average_length = index_stats()
+    length_norm = BM25_K1 * (1 - BM25_B + BM25_B * F('search_postings__document_length') / average_length)
+    tf = F('search_postings__term_frequency')
+    whens = []
+    for term, df in frequencies.items():
+        idf = math.log(1 + (document_count - df + 0.5) / (df + 0.5))
+        whens.append(When(search_postings__term=term, then=Value(idf) * tf * (BM25_K1 + 1) / (tf + length_norm)))
+
+    return (
+        queryset.filter(search_postings__term__in=list(frequencies))
+        .annotate(search_score=Sum(Case(*whens, default=Value(0.0), output_field=models.FloatField())))
+        .order_by('-search_score', '-id')
+    )
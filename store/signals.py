@@ -0,0 +1,135 @@
+from django.db.models import F, Value
+from django.db.models.functions import Concat, Substr
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+from .models import Brand, Category, Product, ProductImage, ProductSpecification, Review
+from .attributes import index_attributes
+from .ratings import refresh_ratings
+from .search import INDEXED_FIELDS, bump_search_version, index_product, reindex_products
+from .facets import affects_facets, bump_facet_changes, bump_facet_version
+from .cache import bump_catalog_version
+from .thumbnails import MODEL_RENDITIONS, schedule as schedule_thumbnails
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def update_product_rating(sender, instance, **kwargs):
+    refresh_ratings([instance.product_id])
+
+
+@receiver(pre_save, sender=Product)
+def remember_slug(sender, instance, raw=False, update_fields=None, **kwargs):
+    # Slugs aren't in the postings, so a full save can't tell a renamed URL
+    # apart from an unchanged product without the stored value.
+    if not raw and instance.pk and update_fields is None:
+        instance._stored_slug = Product.objects.filter(pk=instance.pk).values_list('slug', flat=True).first()
+
+
+@receiver(post_save, sender=Product)
+def update_search_index(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and not INDEXED_FIELDS.intersection(update_fields)):
+        return
+    if update_fields is None:
+        slug_changed = getattr(instance, '_stored_slug', instance.slug) != instance.slug
+    else:
+        slug_changed = 'slug' in update_fields
+    index_product(instance, force=slug_changed)
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Brand)
+def drop_from_search(sender, **kwargs):
+    bump_search_version()
+
+
+@receiver(pre_save, sender=Category)
+@receiver(pre_save, sender=Brand)
+def remember_search_state(sender, instance, raw=False, **kwargs):
+    if not raw and instance.pk:
+        instance._stored_search_state = sender.objects.filter(pk=instance.pk).values_list('name', 'is_active').first()
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Brand)
+def reindex_related_products(sender, instance, raw=False, **kwargs):
+    # Postings carry the name; autocomplete also lists active categories and
+    # brands. Anything else (description, image, ...) leaves search alone.
+    stored = getattr(instance, '_stored_search_state', None)
+    if raw or stored == (instance.name, instance.is_active):
+        return
+    if stored is None or stored[0] != instance.name:
+        reindex_products(instance.products.filter(is_active=True))
+    bump_search_version()
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Brand)
+@receiver(post_delete, sender=Brand)
+def refresh_facets(sender, **kwargs):
+    bump_facet_version()
+
+
+@receiver(post_save, sender=Product)
+def refresh_product_facets(sender, instance, update_fields=None, **kwargs):
+    if affects_facets(instance, update_fields):
+        bump_facet_changes()
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Brand)
+@receiver(post_delete, sender=Brand)
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def invalidate_catalog_cache(sender, **kwargs):
+    bump_catalog_version()
+
+
+@receiver(post_delete, sender=Category)
+def reroot_orphaned_categories(sender, instance, **kwargs):
+    # parent is SET_NULL, so the deleted category's subtree moves up to the root.
+    if instance.path:
+        Category.objects.filter(path__startswith=instance.path).update(
+            path=Concat(Value('/'), Substr('path', len(instance.path) + 1)),
+            depth=F('depth') - (instance.depth + 1),
+        )
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=ProductImage)
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Brand)
+def queue_thumbnails(sender, instance, raw=False, update_fields=None, **kwargs):
+    field = 'logo' if sender is Brand else 'image'
+    if raw or (update_fields is not None and field not in update_fields):
+        return
+    image = getattr(instance, field)
+    if image:
+        renditions = MODEL_RENDITIONS[sender._meta.model_name]
+        transaction.on_commit(lambda: schedule_thumbnails(image.name, renditions))
+
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+@receiver(post_save, sender=ProductSpecification)
+@receiver(post_delete, sender=ProductSpecification)
+def touch_product(sender, instance, raw=False, **kwargs):
+    # Gallery and spec edits change the product page, so they move its
+    # Last-Modified/ETag validator forward.
+    if not raw:
+        Product.objects.filter(pk=instance.product_id).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=ProductSpecification)
+@receiver(post_delete, sender=ProductSpecification)
+def reindex_attributes(sender, instance, raw=False, **kwargs):
+    if not raw:
+        index_attributes([instance.product_id])
+        bump_facet_changes()
@@ -0,0 +1,93 @@
+import math
+from collections import Counter
+import numpy as np
+from scipy import sparse
+from django.db import transaction
+from .cache import bump_catalog_version
+from .models import Product, ProductSpecification, RelatedProduct
+from .search import tokenize
+
+FIELD_WEIGHTS = {
+    'name': 3.0,
+    'specifications': 1.5,
+    'description': 1.0,
+}
+DEFAULT_TOP_K = 12
+DEFAULT_BATCH_SIZE = 256
+MIN_SCORE = 0.05
+
+
+def _documents():
+    specs = {}
+    rows = ProductSpecification.objects.filter(product__is_active=True).values_list('product_id', 'name', 'value')
+    for product_id, name, value in rows.iterator(chunk_size=2000):
+        specs.setdefault(product_id, []).append(f'{name} {value}')
+    products = Product.objects.filter(is_active=True).order_by('pk').values_list('pk', 'name', 'description')
+    for pk, name, description in products.iterator(chunk_size=2000):
+        frequencies = Counter()
+        fields = {'name': name, 'description': description, 'specifications': ' '.join(specs.get(pk, ()))}
+        for field, text in fields.items():
+            for token in tokenize(text):
+                frequencies[token] += FIELD_WEIGHTS[field]
+        yield pk, frequencies
+
+
+def build_matrix():
+    # Rows are L2-normalised TF-IDF vectors (sublinear tf, smoothed idf), so
+    # a plain dot product between two rows is their cosine similarity.
+    ids, rows, columns, weights = [], [], [], []
+    vocabulary = {}
+    for row, (pk, frequencies) in enumerate(_documents()):
+        ids.append(pk)
+        for term, frequency in frequencies.items():
+            rows.append(row)
+            columns.append(vocabulary.setdefault(term, len(vocabulary)))
+            weights.append(1 + math.log(frequency))
+    matrix = sparse.csr_matrix(
+        (np.array(weights, dtype=np.float32), (rows, columns)), shape=(len(ids), len(vocabulary)),
+    )
+    document_frequency = np.bincount(matrix.indices, minlength=len(vocabulary))
+    idf = np.log((1 + len(ids)) / (1 + document_frequency)) + 1
+    matrix = matrix @ sparse.diags(idf.astype(np.float32))
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    matrix = sparse.diags((1 / norms).astype(np.float32)) @ matrix
+    return np.array(ids), matrix.tocsr()
+
+
+def nearest_neighbours(matrix, top_k=DEFAULT_TOP_K, batch_size=DEFAULT_BATCH_SIZE):
+    # Score a block of rows against the whole catalogue with one sparse
+    # product, then pick each row's top k with argpartition.
+    size = matrix.shape[0]
+    top_k = min(top_k, size - 1)
+    if top_k <= 0:
+        return
+    transposed = matrix.T.tocsc()
+    for start in range(0, size, batch_size):
+        scores = (matrix[start:start + batch_size] @ transposed).toarray()
+        block = np.arange(scores.shape[0])
+        scores[block, start + block] = 0
+        top = np.argpartition(-scores, top_k - 1, axis=1)[:, :top_k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind='stable')
+        yield start, np.take_along_axis(top, order, axis=1), np.take_along_axis(top_scores, order, axis=1)
+
+
+def compute_similar_products(top_k=DEFAULT_TOP_K, batch_size=DEFAULT_BATCH_SIZE, min_score=MIN_SCORE):
+    ids, matrix = build_matrix()
+    RelatedProduct.objects.filter(product__is_active=False).delete()
+    stored = 0
+    for start, neighbours, scores in nearest_neighbours(matrix, top_k, batch_size):
+        batch_ids = ids[start:start + len(neighbours)]
+        related = [
+            RelatedProduct(product_id=int(pk), related_id=int(ids[column]), score=float(score), rank=rank)
+            for pk, columns, row_scores in zip(batch_ids, neighbours, scores)
+            for rank, (column, score) in enumerate(zip(columns, row_scores))
+            if score >= min_score
+        ]
+        with transaction.atomic():
+            RelatedProduct.objects.filter(product_id__in=batch_ids.tolist()).delete()
+            RelatedProduct.objects.bulk_create(related, batch_size=1000)
+        stored += len(related)
+    bump_catalog_version()
+    return len(ids), stored
@@ -0,0 +1,25 @@
+from django import template
+from django.utils.html import format_html
+from ..thumbnails import RENDITIONS, fallback_format, srcset
+
+register = template.Library()
+
+
+@register.simple_tag
+def responsive_image(image, rendition='card', alt='', css_class='', style='', sizes=None):
+    if not image:
+        return ''
+    width = RENDITIONS[rendition]
+    sizes = sizes or f'{width}px'
+    webp = srcset(image.name, rendition, 'WEBP')
+    fallback = srcset(image.name, rendition, fallback_format(image.name))
+    if not webp or not fallback:
+        return format_html(
+            '<img src="{}" class="{}" style="{}" alt="{}" loading="lazy">',
+            image.url, css_class, style, alt,
+        )
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" class="{}" style="{}" alt="{}" loading="lazy"></picture>',
+        webp, sizes, fallback.split(' ')[0], fallback, sizes, css_class, style, alt,
+    )
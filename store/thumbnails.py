@@ -0,0 +1,126 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+from .cache import bump_catalog_version
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_DIR = 'thumbnails'
+# Widths per rendition, each also produced at 2x for high-density screens.
+RENDITIONS = {
+    'thumb': 80,
+    'logo': 120,
+    'card': 220,
+    'detail': 450,
+}
+MODEL_RENDITIONS = {
+    'product': ('thumb', 'card', 'detail'),
+    'productimage': ('thumb', 'detail'),
+    'category': ('thumb',),
+    'brand': ('logo',),
+}
+WEBP_QUALITY = 80
+JPEG_QUALITY = 82
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='thumbnails')
+_pending = set()
+_written = False
+_lock = threading.Lock()
+
+
+def rendition_widths(rendition):
+    width = RENDITIONS[rendition]
+    return [width, width * 2]
+
+
+def fallback_format(name):
+    return 'PNG' if name.lower().endswith('.png') else 'JPEG'
+
+
+def derivative_name(name, width, fmt):
+    base, _ = os.path.splitext(name)
+    extension = {'WEBP': 'webp', 'PNG': 'png', 'JPEG': 'jpg'}[fmt]
+    return f'{THUMBNAIL_DIR}/{base}_{width}w.{extension}'
+
+
+def generate(name, renditions=tuple(RENDITIONS), force=False):
+    widths = sorted({width for rendition in renditions for width in rendition_widths(rendition)})
+    missing = [
+        (width, fmt, derivative_name(name, width, fmt))
+        for width in widths for fmt in ('WEBP', fallback_format(name))
+    ]
+    if not force:
+        missing = [(width, fmt, target) for width, fmt, target in missing if not default_storage.exists(target)]
+    if not missing:
+        # Nothing to write, so don't pay for decoding the original.
+        return 0
+    with default_storage.open(name, 'rb') as source:
+        original = ImageOps.exif_transpose(Image.open(source))
+        original.load()
+    created = 0
+    for width, fmt, target in missing:
+        image = original.copy()
+        if image.width > width:
+            image.thumbnail((width, width * 10), Image.LANCZOS)
+        if fmt == 'JPEG' and image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        buffer = BytesIO()
+        if fmt == 'WEBP':
+            image.save(buffer, 'WEBP', quality=WEBP_QUALITY, method=4)
+        elif fmt == 'JPEG':
+            image.save(buffer, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+        else:
+            image.save(buffer, 'PNG', optimize=True)
+        if default_storage.exists(target):
+            default_storage.delete(target)
+        default_storage.save(target, ContentFile(buffer.getvalue()))
+        created += 1
+    return created
+
+
+def _run(name, renditions):
+    global _written
+    created = 0
+    try:
+        created = generate(name, renditions)
+    except Exception:
+        logger.exception('Could not generate thumbnails for %s', name)
+    finally:
+        with _lock:
+            _pending.discard((name, renditions))
+            _written = _written or created > 0
+            drained = not _pending and _written
+            if drained:
+                _written = False
+        if drained:
+            # Cached product cards still point at originals; re-render them.
+            bump_catalog_version()
+
+
+def schedule(name, renditions=tuple(RENDITIONS)):
+    if not name:
+        return
+    renditions = tuple(renditions)
+    with _lock:
+        if (name, renditions) in _pending:
+            return
+        _pending.add((name, renditions))
+    _executor.submit(_run, name, renditions)
+
+
+def srcset(name, rendition, fmt):
+    # Only list derivatives that already exist; missing ones are queued.
+    candidates = []
+    for width in rendition_widths(rendition):
+        target = derivative_name(name, width, fmt)
+        if default_storage.exists(target):
+            candidates.append(f'{default_storage.url(target)} {width}w')
+        else:
+            schedule(name, (rendition,))
+            return ''
+    return ', '.join(candidates)
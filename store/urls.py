@@ -7,6 +7,14 @@ urlpatterns = [
     path('products/<slug:slug>/', views.product_detail_view, name='product_detail'),
     path('category/<slug:slug>/', views.category_products_view, name='category_products'),
     path('search/', views.search_view, name='search'),
+    path('search/autocomplete/', views.autocomplete_view, name='autocomplete'),
+    path('exports/products.<str:fmt>', views.export_products_view, name='export_products'),
+    path('api/products/', views.api_product_list_view, name='api_product_list'),
+    path('api/products/<slug:slug>/', views.api_product_detail_view, name='api_product_detail'),
+    path('api/products/<slug:slug>/reviews/', views.api_product_reviews_view, name='api_product_reviews'),
+    path('api/categories/', views.api_category_list_view, name='api_category_list'),
+    path('api/brands/', views.api_brand_list_view, name='api_brand_list'),
+    path('reviews/<int:review_id>/helpful/', views.review_helpful_view, name='review_helpful'),
     path('wishlist/', views.wishlist_view, name='wishlist'),
     path('wishlist/toggle/<int:product_id>/', views.toggle_wishlist_view, name='toggle_wishlist'),
 ]
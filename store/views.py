@@ -1,54 +1,136 @@
+from decimal import Decimal, InvalidOperation
 from django.shortcuts import render, get_object_or_404, redirect
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.contrib.admin.views.decorators import staff_member_required
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_GET, require_POST
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.core.paginator import Paginator
-from django.db.models import Q, Avg, Count
-from .models import Product, Category, Brand, Review, Wishlist
+from django.db import IntegrityError, transaction
+from django.db.models import Avg, Count, F
+from django.utils import timezone
+from .models import (
+    Product, Category, Brand, RelatedProduct, Review, ReviewVote, Wishlist, effective_price_expression,
+)
 from .forms import ReviewForm, ProductSearchForm
+from .search import matching_ids, search_products, term_frequencies
+from .facets import PRICE_STEP, get_facet_index
+from .attributes import filter_by_attributes
+from .pagination import CursorPaginator, InvalidCursor
+from .cache import cached_for_catalog
+from .popularity import record_view
+from .autocomplete import get_autocompleter
+from .exports import stream_products
+from .bundles import bundle_for_product
+from . import api
+from .conditional import category_etag, product_etag, product_state
 
 
-def home_view(request):
-    featured_products = Product.objects.filter(is_active=True, is_featured=True)[:8]
-    new_arrivals = Product.objects.filter(is_active=True).order_by('-created_at')[:8]
-    categories = Category.objects.filter(is_active=True, parent=None)[:6]
-    on_sale = Product.objects.filter(is_active=True, discount_price__isnull=False)[:8]
-    context = {
-        'featured_products': featured_products,
-        'new_arrivals': new_arrivals,
-        'categories': categories,
-        'on_sale': on_sale,
+def _home_sections():
+    products = Product.objects.filter(is_active=True).select_related('category')
+    return {
+        'featured_products': list(products.filter(is_featured=True)[:8]),
+        'new_arrivals': list(products.order_by('-created_at')[:8]),
+        'categories': list(
+            Category.objects.filter(is_active=True, parent=None)
+            .annotate(product_count=Count('products'))[:6]
+        ),
+        'on_sale': list(products.filter(discount_price__isnull=False)[:8]),
     }
+
+
+def home_view(request):
+    context = cached_for_catalog('home', _home_sections)
     return render(request, 'store/home.html', context)
 
 
+def _listing_url(params, **changes):
+    params = params.copy()
+    params.pop('page', None)
+    params.pop('cursor', None)
+    for key, value in changes.items():
+        if value is None:
+            params.pop(key, None)
+        else:
+            params[key] = value
+    query = params.urlencode()
+    return f'?{query}' if query else '?'
+
+
+def _spec_filters(params):
+    # spec_<key>=value (repeatable) selects enum values; spec_<key>_min and
+    # spec_<key>_max bound numeric attributes.
+    filters = {}
+    for param in params:
+        if not param.startswith('spec_'):
+            continue
+        key, bound = param[5:], None
+        if key.endswith(('_min', '_max')):
+            key, bound = key[:-4], key[-3:]
+        values, low, high = filters.get(key, ((), None, None))
+        if bound:
+            try:
+                number = Decimal(params[param])
+            except InvalidOperation:
+                continue
+            if not number.is_finite():
+                continue
+            low, high = (number, high) if bound == 'min' else (low, number)
+        else:
+            values = tuple(value for value in params.getlist(param) if value)
+        if values or low is not None or high is not None:
+            filters[key] = (values, low, high)
+    return filters
+
+
+def _price_range_url(params, low, high):
+    # Buckets are counted as [low, high) but max_price is inclusive, so the
+    # link stops one paisa short of the next bucket.
+    return _listing_url(params, min_price=str(low), max_price=str(high - PRICE_STEP) if high is not None else None)
+
+
+def _toggle_url(params, name, value):
+    params = params.copy()
+    values = params.getlist(name)
+    params.setlist(name, [v for v in values if v != value] if value in values else [*values, value])
+    return _listing_url(params)
+
+
 def product_list_view(request):
-    products = Product.objects.filter(is_active=True)
-    categories = Category.objects.filter(is_active=True)
-    brands = Brand.objects.filter(is_active=True)
+    products = Product.objects.filter(is_active=True).select_related('category')
     form = ProductSearchForm(request.GET)
+    cleaned = form.cleaned_data if form.is_valid() else {}
 
 
     category_slug = request.GET.get('category')
     brand_slug = request.GET.get('brand')
-    min_price = request.GET.get('min_price')
-    max_price = request.GET.get('max_price')
+    min_price = cleaned.get('min_price')
+    max_price = cleaned.get('max_price')
+    in_stock = request.GET.get('in_stock') == '1'
     search_q = request.GET.get('q')
-    sort = request.GET.get('sort', '-created_at')
+    sort = request.GET.get('sort', 'relevance' if search_q else '-created_at')
 
+    index = get_facet_index()
     if category_slug:
-        products = products.filter(category__slug=category_slug)
+        category_path = index.category_paths.get(category_slug)
+        if category_path:
+            products = products.filter(category__path__startswith=category_path)
+        else:
+            products = products.filter(category__slug=category_slug)
     if brand_slug:
         products = products.filter(brand__slug=brand_slug)
-    if min_price:
-        products = products.filter(price__gte=min_price)
-    if max_price:
-        products = products.filter(price__lte=max_price)
-    if search_q:
-        products = products.filter(
-            Q(name__icontains=search_q) |
-            Q(description__icontains=search_q) |
-            Q(category__name__icontains=search_q)
-        )
+    if min_price is not None or max_price is not None:
+        products = products.annotate(effective_price_value=effective_price_expression())
+    if min_price is not None:
+        products = products.filter(effective_price_value__gte=min_price)
+    if max_price is not None:
+        products = products.filter(effective_price_value__lte=max_price)
+    if in_stock:
+        products = products.filter(stock__gt=0)
+    spec_filters = _spec_filters(request.GET)
+    if spec_filters:
+        products = filter_by_attributes(products, spec_filters)
 
 
     sort_options = {
@@ -56,40 +138,141 @@ def product_list_view(request):
         'price_desc': '-price',
         'name_asc': 'name',
         'newest': '-created_at',
-        'popular': '-created_at',
+        'popular': '-popularity',
     }
-    products = products.order_by(sort_options.get(sort, '-created_at'))
+    candidates = None
+    if search_q:
+        # One postings lookup feeds both the facet mask and the scored query.
+        frequencies = term_frequencies(search_q)
+        candidates = index.mask_for_ids(matching_ids(frequencies)) if frequencies else 0
+        products = search_products(search_q, products, frequencies)
+        if sort != 'relevance':
+            products = products.order_by(sort_options.get(sort, '-created_at'))
+    else:
+        products = products.order_by(sort_options.get(sort, '-created_at'))
 
-    paginator = Paginator(products, 12)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    facets = index.counts(
+        category=category_slug, brand=brand_slug, min_price=min_price, max_price=max_price,
+        in_stock=in_stock, candidates=candidates, attributes=spec_filters,
+    )
+    params = request.GET
+    for value in facets['categories']:
+        value['url'] = _listing_url(params, category=value['slug'])
+        value['selected'] = value['slug'] == category_slug
+    for value in facets['brands']:
+        value['url'] = _listing_url(params, brand=value['slug'])
+        value['selected'] = value['slug'] == brand_slug
+    for bucket in facets['price_buckets']:
+        bucket['url'] = _price_range_url(params, bucket['min'], bucket['max'])
+    facets['price_histogram'] = index.price_histogram(category_slug)
+    for bucket in facets['price_histogram']:
+        bucket['url'] = _price_range_url(params, bucket['min'], bucket['max'])
+        bucket['selected'] = (
+            (min_price is None or bucket['max'] > min_price) and (max_price is None or bucket['min'] <= max_price)
+        )
+    for facet in facets['attributes']:
+        name = f'spec_{facet["key"]}'
+        selected = spec_filters.get(facet['key'], ((), None, None))
+        for option in facet.get('options', []):
+            option['url'] = _toggle_url(params, name, option['value'])
+            option['selected'] = option['value'] in selected[0]
+        if 'range' in facet:
+            facet['range'].update(
+                min_name=f'{name}_min', max_name=f'{name}_max', current_min=selected[1], current_max=selected[2],
+                hidden=[
+                    (key, value) for key, values in params.lists() if key not in (f'{name}_min', f'{name}_max', 'cursor', 'page')
+                    for value in values
+                ],
+            )
+        facet['clear_url'] = _listing_url(params, **{name: None, f'{name}_min': None, f'{name}_max': None})
+    facets['in_stock_url'] = _listing_url(params, in_stock=None if in_stock else '1')
+    facets['clear_category_url'] = _listing_url(params, category=None)
+    facets['clear_brand_url'] = _listing_url(params, brand=None)
+
+    if search_q and sort == 'relevance':
+        paginator = Paginator(products, 12)
+        page_obj = paginator.get_page(request.GET.get('page'))
+        page_obj.page_urls = [(num, _listing_url(params, page=num)) for num in paginator.page_range]
+        if page_obj.has_next():
+            page_obj.next_url = _listing_url(params, page=page_obj.next_page_number())
+        if page_obj.has_previous():
+            page_obj.previous_url = _listing_url(params, page=page_obj.previous_page_number())
+    else:
+        paginator = CursorPaginator(products, sort_options.get(sort, '-created_at'), 12, count=facets['total'])
+        page_obj = paginator.get_page(request.GET.get('cursor'))
+        page_obj.next_url = _listing_url(params, cursor=page_obj.next_cursor)
+        page_obj.previous_url = _listing_url(params, cursor=page_obj.previous_cursor)
 
     context = {
         'page_obj': page_obj,
-        'categories': categories,
-        'brands': brands,
+        'facets': facets,
+        'in_stock': in_stock,
         'form': form,
-        'total_count': products.count(),
+        'total_count': facets['total'],
         'current_sort': sort,
     }
     return render(request, 'store/product_list.html', context)
 
 
+REVIEW_SORT_OPTIONS = {
+    'newest': '-created_at',
+    'highest': ('-rating', '-created_at'),
+    'helpful': ('-helpful_count', '-created_at'),
+}
+REVIEWS_PER_PAGE = 10
+
+
+@cache_control(private=True, no_cache=True)
 def product_detail_view(request, slug):
+    # Count the view before the conditional check so revalidated (304) hits
+    # still feed the popularity score.
+    state = product_state(request, slug)
+    if state and request.method == 'GET':
+        record_view(state['id'])
+    return _product_detail(request, slug)
+
+
+@condition(etag_func=product_etag)
+def _product_detail(request, slug):
     product = get_object_or_404(Product, slug=slug, is_active=True)
-    reviews = product.reviews.filter(is_approved=True).select_related('user')
-    related_products = Product.objects.filter(
-        category=product.category, is_active=True
-    ).exclude(id=product.id)[:4]
+    reviews = product.reviews.filter(is_approved=True)
+    review_sort = request.GET.get('review_sort', 'newest')
+    if review_sort not in REVIEW_SORT_OPTIONS:
+        review_sort = 'newest'
+    review_page = CursorPaginator(
+        reviews.select_related('user'), REVIEW_SORT_OPTIONS[review_sort], REVIEWS_PER_PAGE,
+        count=product.rating_count,
+    ).get_page(request.GET.get('reviews_cursor'))
+    review_page.next_url = _listing_url(request.GET, reviews_cursor=review_page.next_cursor) + '#reviews'
+    review_page.previous_url = _listing_url(request.GET, reviews_cursor=review_page.previous_cursor) + '#reviews'
+    review_sort_urls = {
+        key: _listing_url(request.GET, review_sort=key, reviews_cursor=None) + '#reviews'
+        for key in REVIEW_SORT_OPTIONS
+    }
+    related_products = [
+        link.related for link in RelatedProduct.objects.filter(
+            product=product, related__is_active=True, related__stock__gt=0
+        ).select_related('related__category').order_by('rank')[:4]
+    ]
+    if not related_products:
+        related_products = Product.objects.filter(
+            category=product.category, is_active=True, stock__gt=0
+        ).select_related('category').exclude(id=product.id)[:4]
     specs = product.specifications.all()
     gallery = product.images.all()
+    category_ancestors = product.category.get_ancestors() if product.category else []
+    bought_together = bundle_for_product(product.id)
 
 
     user_review = None
     is_wishlisted = False
+    voted_review_ids = set()
     if request.user.is_authenticated:
         user_review = reviews.filter(user=request.user).first()
         is_wishlisted = Wishlist.objects.filter(user=request.user, product=product).exists()
+        voted_review_ids = set(ReviewVote.objects.filter(
+            user=request.user, review_id__in=[review.id for review in review_page]
+        ).values_list('review_id', flat=True))
 
 
     if request.method == 'POST' and request.user.is_authenticated:
@@ -115,10 +298,15 @@ def product_detail_view(request, slug):
 
     context = {
         'product': product,
-        'reviews': reviews,
+        'review_page': review_page,
+        'review_sort': review_sort,
+        'review_sort_urls': review_sort_urls,
+        'voted_review_ids': voted_review_ids,
         'related_products': related_products,
+        'bought_together': bought_together,
         'specs': specs,
         'gallery': gallery,
+        'category_ancestors': category_ancestors,
         'review_form': form,
         'user_review': user_review,
         'is_wishlisted': is_wishlisted,
@@ -127,17 +315,47 @@ def product_detail_view(request, slug):
     return render(request, 'store/product_detail.html', context)
 
 
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=category_etag)
 def category_products_view(request, slug):
     category = get_object_or_404(Category, slug=slug, is_active=True)
-    products = Product.objects.filter(category=category, is_active=True)
-    paginator = Paginator(products, 12)
-    page_obj = paginator.get_page(request.GET.get('page'))
+    products = Product.objects.filter(
+        category__path__startswith=category.path, is_active=True
+    ).select_related('category')
+    count = get_facet_index().category_count(category.slug)
+    paginator = CursorPaginator(products, '-created_at', 12, count=count)
+    page_obj = paginator.get_page(request.GET.get('cursor'))
+    page_obj.next_url = _listing_url(request.GET, cursor=page_obj.next_cursor)
+    page_obj.previous_url = _listing_url(request.GET, cursor=page_obj.previous_cursor)
     return render(request, 'store/category_products.html', {
         'category': category,
+        'ancestors': category.get_ancestors(),
+        'subcategories': category.children.filter(is_active=True),
         'page_obj': page_obj,
     })
 
 
+@login_required
+@require_POST
+def review_helpful_view(request, review_id):
+    review = get_object_or_404(Review.objects.select_related('product'), id=review_id, is_approved=True)
+    if review.user_id == request.user.id:
+        messages.warning(request, 'You cannot vote on your own review.')
+    else:
+        try:
+            with transaction.atomic():
+                ReviewVote.objects.create(review=review, user=request.user)
+                # Touching updated_at moves the product page's ETag along with the count.
+                Review.objects.filter(pk=review.pk).update(
+                    helpful_count=F('helpful_count') + 1, updated_at=timezone.now()
+                )
+        except IntegrityError:
+            messages.info(request, 'You have already marked this review as helpful.')
+        else:
+            messages.success(request, 'Thanks for your feedback!')
+    return redirect(f'{review.product.get_absolute_url()}#reviews')
+
+
 @login_required
 def toggle_wishlist_view(request, product_id):
     product = get_object_or_404(Product, id=product_id, is_active=True)
@@ -153,14 +371,164 @@ def toggle_wishlist_view(request, product_id):
 
 @login_required
 def wishlist_view(request):
-    wishlist = Wishlist.objects.filter(user=request.user).select_related('product')
+    wishlist = Wishlist.objects.filter(user=request.user).select_related('product__category')
     return render(request, 'store/wishlist.html', {'wishlist': wishlist})
 
 
 def search_view(request):
     q = request.GET.get('q', '')
-    products = Product.objects.filter(
-        Q(name__icontains=q) | Q(description__icontains=q),
-        is_active=True
-    ) if q else Product.objects.none()
-    return render(request, 'store/search_results.html', {'products': products, 'query': q})
+    products = search_products(q, Product.objects.filter(is_active=True).select_related('category'))
+    paginator = Paginator(products, 12)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    return render(request, 'store/search_results.html', {'page_obj': page_obj, 'query': q})
+
+
+def autocomplete_view(request):
+    q = request.GET.get('q', '')
+    try:
+        limit = min(max(int(request.GET.get('limit', 8)), 1), 20)
+    except ValueError:
+        limit = 8
+    suggestions = get_autocompleter().suggest(q[:64], limit)
+    return JsonResponse({
+        'query': q,
+        **{
+            group: [{'label': entry['label'], 'url': entry['url']} for entry in entries]
+            for group, entries in suggestions.items()
+        },
+    })
+
+
+API_SORT_OPTIONS = {
+    'newest': '-created_at',
+    'price_asc': 'price',
+    'price_desc': '-price',
+    'name_asc': 'name',
+    'popular': '-popularity',
+}
+
+
+def _api_error(message, status=400):
+    return JsonResponse({'error': message}, status=status)
+
+
+def _api_page_size(request):
+    try:
+        return min(max(int(request.GET.get('limit', 20)), 1), api.MAX_PAGE_SIZE)
+    except ValueError:
+        return 20
+
+
+def _api_page(request, serializer, queryset, names, ordering):
+    sort_keys = [name.lstrip('-') for name in ([ordering] if isinstance(ordering, str) else ordering)]
+    rows = serializer.values(queryset, names, extra=['id', *sort_keys])
+    try:
+        page_obj = CursorPaginator(rows, ordering, _api_page_size(request)).page(request.GET.get('cursor'))
+    except InvalidCursor:
+        return _api_error('Invalid cursor.')
+    return JsonResponse({
+        'results': serializer.serialize(page_obj.object_list, names),
+        'next': request.path + _listing_url(request.GET, cursor=page_obj.next_cursor) if page_obj.has_next() else None,
+        'previous': (
+            request.path + _listing_url(request.GET, cursor=page_obj.previous_cursor)
+            if page_obj.has_previous() else None
+        ),
+    })
+
+
+def _api_batch(request, serializer, queryset, names):
+    # ?ids=1,2,3 or ?slugs=a,b,c: one query, results in the order asked for.
+    if request.GET.get('ids'):
+        key, wanted = 'id', api.parse_batch(request.GET['ids'], int)
+    else:
+        key, wanted = 'slug', api.parse_batch(request.GET['slugs'])
+    rows = serializer.values(queryset.filter(**{f'{key}__in': wanted}), names, extra=['id', key])
+    by_key = {row[key]: row for row in rows}
+    found = [by_key[value] for value in wanted if value in by_key]
+    return JsonResponse({
+        'results': serializer.serialize(found, names),
+        'missing': [value for value in wanted if value not in by_key],
+    })
+
+
+def _api_list(request, serializer, queryset, ordering):
+    try:
+        names = serializer.parse_fields(request.GET.get('fields'))
+        if request.GET.get('ids') or request.GET.get('slugs'):
+            return _api_batch(request, serializer, queryset, names)
+    except api.FieldError as exc:
+        return _api_error(str(exc))
+    return _api_page(request, serializer, queryset, names, ordering)
+
+
+@require_GET
+def api_product_list_view(request):
+    products = Product.objects.filter(is_active=True)
+    category_slug = request.GET.get('category')
+    if category_slug:
+        category_path = get_facet_index().category_paths.get(category_slug)
+        products = products.filter(category__path__startswith=category_path) if category_path else products.none()
+    if request.GET.get('brand'):
+        products = products.filter(brand__slug=request.GET['brand'])
+    if request.GET.get('in_stock') == '1':
+        products = products.filter(stock__gt=0)
+    sort = request.GET.get('sort', 'newest')
+    if sort not in API_SORT_OPTIONS:
+        return _api_error(f'Unknown sort "{sort}".')
+    return _api_list(request, api.products, products, API_SORT_OPTIONS[sort])
+
+
+@require_GET
+def api_product_detail_view(request, slug):
+    try:
+        names = api.products.parse_fields(request.GET.get('fields'), default=api.PRODUCT_DETAIL_FIELDS)
+    except api.FieldError as exc:
+        return _api_error(str(exc))
+    rows = list(api.products.values(Product.objects.filter(slug=slug, is_active=True), names, extra=['id']))
+    if not rows:
+        return _api_error('Product not found.', status=404)
+    return JsonResponse(api.products.serialize(rows, names)[0])
+
+
+@require_GET
+def api_product_reviews_view(request, slug):
+    product_id = Product.objects.filter(slug=slug, is_active=True).values_list('id', flat=True).first()
+    if product_id is None:
+        return _api_error('Product not found.', status=404)
+    try:
+        names = api.reviews.parse_fields(request.GET.get('fields'))
+    except api.FieldError as exc:
+        return _api_error(str(exc))
+    sort = request.GET.get('sort', 'newest')
+    if sort not in REVIEW_SORT_OPTIONS:
+        return _api_error(f'Unknown sort "{sort}".')
+    reviews = Review.objects.filter(product_id=product_id, is_approved=True)
+    return _api_page(request, api.reviews, reviews, names, REVIEW_SORT_OPTIONS[sort])
+
+
+@require_GET
+def api_category_list_view(request):
+    return _api_list(request, api.categories, Category.objects.filter(is_active=True), 'path')
+
+
+@require_GET
+def api_brand_list_view(request):
+    return _api_list(request, api.brands, Brand.objects.filter(is_active=True), 'name')
+
+
+EXPORT_CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+}
+
+
+@staff_member_required
+def export_products_view(request, fmt):
+    if fmt not in EXPORT_CONTENT_TYPES:
+        raise Http404
+    products = Product.objects.all()
+    if request.GET.get('active') == '1':
+        products = products.filter(is_active=True)
+    response = StreamingHttpResponse(stream_products(fmt, products), content_type=EXPORT_CONTENT_TYPES[fmt])
+    response['Content-Disposition'] = f'attachment; filename="products.{fmt}"'
+    return response
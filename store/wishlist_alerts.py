@@ -0,0 +1,126 @@
+from itertools import groupby
+from operator import itemgetter
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import F, OuterRef, Q, Subquery
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils import timezone
+from .models import Product, ProductSnapshot, Wishlist, effective_price_expression
+
+EMAIL_BATCH_SIZE = 100
+CHUNK_SIZE = 2000
+
+
+def pending_alerts(chunk_size=CHUNK_SIZE):
+    # A single joined query over wishlist -> product -> snapshot picks out the
+    # rows whose product got cheaper or came back in stock between the last
+    # run's baseline and the values staged for this one. Rows added after the
+    # last run are skipped: their baseline is the price they were added at.
+    rows = (
+        Wishlist.objects.filter(
+            user__is_active=True,
+            product__is_active=True,
+            added_at__lte=F('product__snapshot__taken_at'),
+        )
+        .annotate(
+            new_price=F('product__snapshot__pending_price'),
+            new_stock=F('product__snapshot__pending_stock'),
+            old_price=F('product__snapshot__effective_price'),
+            old_stock=F('product__snapshot__stock'),
+        )
+        .filter(Q(new_price__lt=F('old_price')) | Q(new_stock__gt=0, old_stock=0))
+        .values(
+            'id', 'user_id', 'user__email', 'user__first_name', 'product__name', 'product__slug',
+            'new_price', 'new_stock', 'old_price', 'old_stock',
+        )
+        .order_by('user_id', 'id')
+    )
+    # Keyset over (user, id) so each user's rows stay adjacent across batches.
+    last = None
+    while True:
+        batch = rows
+        if last is not None:
+            batch = batch.filter(Q(user_id__gt=last[0]) | Q(user_id=last[0], id__gt=last[1]))
+        batch = list(batch[:chunk_size])
+        if not batch:
+            return
+        yield from batch
+        last = batch[-1]['user_id'], batch[-1]['id']
+
+
+def build_message(rows):
+    items = [
+        {
+            'name': row['product__name'],
+            'url': settings.SITE_URL + reverse('product_detail', args=[row['product__slug']]),
+            'old_price': row['old_price'],
+            'new_price': row['new_price'],
+            'price_dropped': row['new_price'] < row['old_price'],
+            'back_in_stock': row['old_stock'] == 0 and row['new_stock'] > 0,
+        }
+        for row in rows
+    ]
+    body = render_to_string('store/emails/wishlist_alert.txt', {
+        'first_name': rows[0]['user__first_name'],
+        'items': items,
+        'wishlist_url': settings.SITE_URL + reverse('wishlist'),
+    })
+    subject = 'Good news about your wishlist' if len(items) > 1 else f'Good news about {items[0]["name"]}'
+    return EmailMessage(subject, body, to=[rows[0]['user__email']])
+
+
+def stage_snapshots(taken_at, chunk_size=CHUNK_SIZE):
+    # Freeze the live price and stock that this run will report. Products
+    # seen for the first time get them as their baseline too.
+    missing = (
+        Product.objects.filter(snapshot__isnull=True)
+        .annotate(value=effective_price_expression())
+        .values_list('id', 'value', 'stock')
+    )
+    created = 0
+    while True:
+        batch = list(missing[:chunk_size])
+        if not batch:
+            break
+        ProductSnapshot.objects.bulk_create([
+            ProductSnapshot(
+                product_id=pk, effective_price=price, stock=stock, taken_at=taken_at,
+                pending_price=price, pending_stock=stock,
+            )
+            for pk, price, stock in batch
+        ], ignore_conflicts=True)
+        created += len(batch)
+    live = Product.objects.filter(pk=OuterRef('pk'))
+    ProductSnapshot.objects.update(
+        pending_price=Subquery(live.annotate(value=effective_price_expression()).values('value')[:1]),
+        pending_stock=Subquery(live.values('stock')[:1]),
+    )
+    return created
+
+
+def commit_snapshots(taken_at):
+    # The staged values, i.e. exactly what was emailed, become the baseline.
+    return ProductSnapshot.objects.filter(pending_price__isnull=False).update(
+        effective_price=F('pending_price'), stock=F('pending_stock'), taken_at=taken_at,
+    )
+
+
+def send_wishlist_alerts(batch_size=EMAIL_BATCH_SIZE, dry_run=False):
+    # One email per user covering every product that changed for them, sent
+    # through a single backend connection in batches.
+    started = timezone.now()
+    stage_snapshots(started)
+    sent = 0
+    pending = []
+    with get_connection(fail_silently=False) as connection:
+        for _, rows in groupby(pending_alerts(), key=itemgetter('user_id')):
+            pending.append(build_message(list(rows)))
+            if len(pending) >= batch_size:
+                sent += len(pending) if dry_run else connection.send_messages(pending) or 0
+                pending = []
+        if pending:
+            sent += len(pending) if dry_run else connection.send_messages(pending) or 0
+    if not dry_run:
+        commit_snapshots(started)
+    return sent